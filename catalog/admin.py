@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import json
+from itertools import islice
 from django.contrib import admin
 from django.contrib.admin.utils import label_for_field
 from django.template.response import TemplateResponse
@@ -8,15 +9,22 @@ from django.utils.translation import ugettext_lazy as _
 from django.utils.functional import Promise
 from django.utils.encoding import force_text
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core.paginator import Paginator
 from django.core.exceptions import ValidationError, PermissionDenied
+from django.db import transaction
+from django.db.models import Case, When, Subquery, OuterRef, Q
 from django.db.models.fields import FieldDoesNotExist
 from django.apps import apps
-from django.http import JsonResponse, HttpResponse
+from django.contrib.contenttypes.models import ContentType
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
 from django import forms
+from mptt.exceptions import InvalidMove
 from .models import TreeItem
-from .utils import get_catalog_models
-from .grid import GridRow
+from .utils import get_catalog_models, prefetch_content_objects, \
+    get_absolute_urls
+from .grid import GridRow, GridModel, URL_PLACEHOLDER
+from .instrumentation import instrument
 from .signals import content_object_parent_changed, content_object_created, content_object_moved
 
 
@@ -33,6 +41,7 @@ class LazyEncoder(DjangoJSONEncoder):
 class CatalogAdmin(admin.ModelAdmin):
     change_list_template = 'admin/catalog/tree_list.html'
     model = TreeItem
+    search_limit = 100
 
     def changelist_view(self, request):
         if not self.has_change_permission(request, None):
@@ -48,6 +57,7 @@ class CatalogAdmin(admin.ModelAdmin):
             'opts': opts,
             'app_config': app_config,
             'site_header': self.admin_site.site_header,
+            'add_links': self.get_add_links(),
         }
         return TemplateResponse(request, self.change_list_template, context)
 
@@ -80,67 +90,176 @@ class CatalogAdmin(admin.ModelAdmin):
                     field_names.append(field_name)
         return fields
 
-    def get_node_data(self, treeitem):
+    def get_url_templates(self):
+        """
+        Resolve urls used by tree nodes once, object ids and paths are
+        filled in by `get_node_data`
+        :return: dict with watch url templates and change and add urls of
+                 every catalog model
+        """
+        templates = {
+            'root': reverse('catalog-root'),
+            'watch': reverse('catalog-item', args=(URL_PLACEHOLDER,)),
+        }
+        for model_cls in get_catalog_models():
+            opts = model_cls._meta
+            templates[model_cls] = {
+                'change': reverse('admin:{0}_{1}_change'.
+                                  format(opts.app_label, opts.model_name),
+                                  args=(URL_PLACEHOLDER,)),
+                'add': reverse('admin:{0}_{1}_add'.
+                               format(opts.app_label, opts.model_name)),
+            }
+        return templates
+
+    def get_add_links(self):
+        """
+        :return: add links of catalog models by content type id of models
+                 which may have children. Client appends target node id
+        """
+        links = []
+        for model_cls in get_catalog_models():
+            links.append({
+                'url': reverse('admin:{0}_{1}_add'.
+                               format(model_cls._meta.app_label,
+                                      model_cls._meta.model_name)),
+                'label': force_text(_(u'Add %(model_name)s') % {
+                    'model_name': model_cls._meta.verbose_name
+                }),
+            })
+        content_types = ContentType.objects.get_for_models(
+            *get_catalog_models())
+        return {content_type.id: links
+                for model_cls, content_type in content_types.items()
+                if model_cls.leaf is False}
+
+    def get_node_data(self, treeitem, lazy=False, url_templates=None):
         """
         :param treeitem: TreeItem object
+        :param lazy: node data for lazy loading, with children flag
+                     instead of parent id
+        :param url_templates: result of `get_url_templates`
         :return: JSON data of TreeItem object and his content_object
         """
+        if url_templates is None:
+            url_templates = self.get_url_templates()
         node = {}
         obj = treeitem.content_object
-        if treeitem.parent is None:
+        if lazy:
+            node['children'] = not treeitem.is_leaf_node()
+        elif treeitem.parent_id is None:
             node['parent'] = '#'
         else:
-            node['parent'] = treeitem.parent.id
+            node['parent'] = treeitem.parent_id
         if obj.leaf is True:
             node['type'] = 'leaf'
         node['id'] = treeitem.id
         node['text'] = treeitem.__str__()
         node['data'] = {}
-        change_link = reverse('admin:{0}_{1}_change'. \
-                              format(obj.__class__._meta.app_label,
-                                     obj.__class__.__name__.lower()),
-                              args=(obj.id,))
-        copy_link = reverse('admin:{0}_{1}_add'. \
-                            format(obj.__class__._meta.app_label,
-                                   obj.__class__._meta.model_name)) + \
-                    '?copy={}'.format(treeitem.id)
+        model_urls = url_templates[obj.__class__]
+        change_link = model_urls['change'].replace(URL_PLACEHOLDER,
+                                                   str(obj.id))
+        copy_link = model_urls['add'] + '?copy={}'.format(treeitem.id)
 
         complete_slug = treeitem.content_object.get_complete_slug()
         if complete_slug == '':
-            watch_link = reverse('catalog-root')
+            watch_link = url_templates['root']
         else:
-            watch_link = reverse('catalog-item', args=(complete_slug,))
+            watch_link = url_templates['watch'].replace(URL_PLACEHOLDER,
+                                                        complete_slug)
 
         node['data']['change_link'] = change_link
         node['data']['copy_link'] = copy_link
         node['data']['watch_link'] = watch_link
-
-        if obj.leaf is False:
-            node['data']['add_links'] = []
-            for model_cls in get_catalog_models():
-                node['data']['add_links'].\
-                    append({
-                           'url': reverse('admin:{0}_{1}_add'. \
-                                          format(model_cls._meta.app_label,
-                                                 model_cls._meta.model_name))
-                                  + '?target={}'.format(treeitem.id),
-                           'label': _(u'Add %(model_name)s') %
-                                    {
-                                    'model_name': model_cls._meta.verbose_name
-                                    }
-                           })
+        node['data']['content_type'] = treeitem.content_type_id
         return node
 
     def json_tree(self, request):
         """
         :param request:
+            request.GET may contain id: id of node to get children of,
+            `#` for root nodes. Without id the whole tree is streamed
         :return: JSON structure of catalog for jsTree
         """
-        tree = []
-        for treeitem in TreeItem.objects.all():
-            tree.append(self.get_node_data(treeitem))
+        node_id = request.GET.get('id', None)
+        if node_id is None:
+            return StreamingHttpResponse(
+                self.iter_json_tree(TreeItem.objects.all()),
+                content_type='application/json')
+        return self.json_tree_children(node_id)
+
+    @instrument('admin.json_tree')
+    def json_tree_children(self, node_id):
+        """
+        :param node_id: id of node to get children of, `#` for root nodes
+        :return: JSON list of children nodes for jsTree
+        """
+        if node_id == '#':
+            nodes_qs = TreeItem.objects.root_nodes()
+        else:
+            try:
+                nodes_qs = TreeItem.objects.filter(parent=int(node_id))
+            except ValueError:
+                nodes_qs = TreeItem.objects.none()
+        items = prefetch_content_objects(nodes_qs)
+        get_absolute_urls([item.content_object for item in items])
+        url_templates = self.get_url_templates()
+        tree = [self.get_node_data(treeitem, lazy=True,
+                                   url_templates=url_templates)
+                for treeitem in items]
         return JsonResponse(tree, safe=False, encoder=LazyEncoder)
 
+    @instrument('admin.json_tree')
+    def iter_json_tree(self, nodes_qs, chunk_size=500):
+        """
+        :param nodes_qs: QuerySet of TreeItem objects
+        :return: iterator over parts of JSON list with nodes data,
+                 content objects are loaded by chunks
+        """
+        url_templates = self.get_url_templates()
+        yield '['
+        separator = ''
+        nodes = nodes_qs.iterator(chunk_size=chunk_size)
+        chunk = list(islice(nodes, chunk_size))
+        while chunk:
+            items = prefetch_content_objects(chunk)
+            get_absolute_urls([item.content_object for item in items])
+            for treeitem in items:
+                node = self.get_node_data(treeitem,
+                                          url_templates=url_templates)
+                yield separator + json.dumps(node, cls=LazyEncoder)
+                separator = ','
+            chunk = list(islice(nodes, chunk_size))
+        yield ']'
+
+    @instrument('admin.search_tree')
+    def search_tree(self, request):
+        """
+        Search nodes by search text of content objects. Substring match
+        uses trigram index on PostgreSQL only, on other databases all
+        nodes are scanned
+        :param request:
+            request.GET contains str: search string
+        :return: JSON data with ids of matched nodes and ids of their
+                 ancestors which have to be opened in tree
+        """
+        query = request.GET.get('str', '').strip().lower()
+        response = {'matches': [], 'open': []}
+        if query:
+            matches = list(TreeItem.objects.
+                           filter(search_text__contains=query).
+                           values_list('id', 'tree_id', 'lft', 'rght')
+                           [:self.search_limit])
+            q = Q()
+            for item_id, tree_id, lft, rght in matches:
+                q |= Q(tree_id=tree_id, lft__lt=lft, rght__gt=rght)
+            response['matches'] = [match[0] for match in matches]
+            if matches:
+                response['open'] = list(TreeItem.objects.filter(q).
+                                        values_list('id', flat=True))
+        return JsonResponse(response)
+
+    @instrument('admin.move_tree_item')
     def move_tree_item(self, request):
         """
         Moves node relative to a given target node as specified
@@ -206,6 +325,38 @@ class CatalogAdmin(admin.ModelAdmin):
         return JsonResponse({'status': 'error', 'type_message': 'error',
                              'message': message}, encoder=LazyEncoder)
 
+    @instrument('admin.bulk_move_tree_items')
+    def bulk_move_tree_items(self, request):
+        """
+        Moves many nodes in one transaction
+        :param request:
+            request.body contains JSON list of moves, every move contains
+            item_id, target_id and position like in `move_tree_item`
+        :return: JSON data with results of operation
+        """
+        if request.method == 'POST':
+            try:
+                operations = [(int(move['item_id']), int(move['target_id']),
+                               move['position'])
+                              for move in json.loads(request.body.decode('utf-8'))]
+            except (ValueError, KeyError, TypeError):
+                operations = None
+            if operations:
+                try:
+                    TreeItem.bulk_move(operations)
+                except InvalidMove as e:
+                    return JsonResponse({'status': 'error',
+                                         'type_message': 'error',
+                                         'message': e.args[0]},
+                                        encoder=LazyEncoder)
+                message = _(u'Successful move')
+                return JsonResponse({'status': 'OK', 'type_message': 'info',
+                                     'message': message}, encoder=LazyEncoder)
+        message = _(u'Bad request')
+        return JsonResponse({'status': 'error', 'type_message': 'error',
+                             'message': message}, encoder=LazyEncoder)
+
+    @instrument('admin.edit_tree_item')
     def edit_tree_item(self, request):
         """
         Edit Catalog object
@@ -247,7 +398,8 @@ class CatalogAdmin(admin.ModelAdmin):
                                      'type_message': 'error',
                                      'message': message},
                                     encoder=LazyEncoder)
-            obj.save()
+            with transaction.atomic():
+                obj.save()
             message = _(u'Save changes')
             return JsonResponse({'status': 'OK', 'type_message': 'info',
                                  'message': message}, encoder=LazyEncoder)
@@ -256,6 +408,7 @@ class CatalogAdmin(admin.ModelAdmin):
             return JsonResponse({'status': 'error', 'type_message': 'error',
                                  'message': message}, encoder=LazyEncoder)
 
+    @instrument('admin.delete_tree_item')
     def delete_tree_item(self, request):
         """
         Delete TreeItem object
@@ -280,36 +433,56 @@ class CatalogAdmin(admin.ModelAdmin):
         return JsonResponse({'status': 'error', 'type_message': 'error',
                              'message': message}, encoder=LazyEncoder)
 
+    @instrument('admin.list_children')
     def list_children(self, request, parent_id=None):
         """
         :param parent_id: id of parent TreeItem object
+        :param request:
+            request.GET may contain
+            page: number of page
+            per_page: size of page, all children are listed by default
+            sort: name of display field, order: asc or desc
         :return: JSON data with fields for display and list children of
         the parent node
         """
-        if parent_id is None:
-            nodes_qs = TreeItem.objects.root_nodes()
-        else:
-            nodes_qs = TreeItem.objects.get(id=int(parent_id)).get_children()
+        nodes_qs = TreeItem.objects.filter(
+            parent=int(parent_id) if parent_id is not None else None)
 
         response = {}
-        if nodes_qs.count() == 0:
+        content_type_ids = nodes_qs.order_by().values_list(
+            'content_type', flat=True).distinct()
+        models = [ContentType.objects.get_for_id(content_type_id).model_class()
+                  for content_type_id in sorted(content_type_ids)]
+        if not models:
             return JsonResponse(response)
-        distinct_node_types = []
-        try:
-            distinct_node_types = nodes_qs.order_by('content_type__id').distinct('content_type__id')
-            distinct_node_types.exists()
-        except NotImplementedError:
-            # backend sqlite3 not supported DISTINCT operation
-            from django.db.models import Min
-            distinct_node_types = nodes_qs.order_by('content_type__id').annotate(content_type__id=Min('content_type__id'))
-
-        models = [node.content_object.__class__ for node in distinct_node_types]
         fields = self.get_display_fields(models)
+        field_names = [field[0] for field in fields]
+
+        nodes_qs = self.sort_children(nodes_qs, models,
+                                      request.GET.get('sort', None),
+                                      request.GET.get('order', None) == 'desc')
+        try:
+            per_page = int(request.GET.get('per_page', 0))
+        except ValueError:
+            per_page = 0
+        if per_page > 0:
+            paginator = Paginator(nodes_qs, per_page)
+            page = paginator.get_page(request.GET.get('page', 1))
+            nodes_qs = page.object_list
+            response['page'] = page.number
+            response['num_pages'] = paginator.num_pages
+            response['count'] = paginator.count
+
+        grid_models = {}
+        for model_cls in models:
+            grid_models[model_cls] = GridModel(model_cls, field_names,
+                                               admin.site._registry[model_cls])
         nodes = []
-        for item in nodes_qs:
-            admin_cls = admin.site._registry[type(item.content_object)]
-            node = GridRow(item.content_object,
-                           [field[0] for field in fields], admin_cls)
+        for item in prefetch_content_objects(nodes_qs):
+            grid_model = grid_models[type(item.content_object)]
+            node = GridRow(item.content_object, field_names,
+                           grid_model.admin_cls, treeitem=item,
+                           grid_model=grid_model)
             nodes.append(node.json_data())
 
         response['fields'] = fields
@@ -317,10 +490,43 @@ class CatalogAdmin(admin.ModelAdmin):
 
         return JsonResponse(response, safe=False, encoder=LazyEncoder)
 
+    def sort_children(self, nodes_qs, models, sort, descending=False):
+        """
+        Order nodes by model field `sort` of their content objects in
+        database. Nodes stay in tree order if any of models has no such
+        concrete field or fields are of different types
+        :return: QuerySet of TreeItem objects
+        """
+        if not sort:
+            return nodes_qs
+        modelfields = []
+        for model_cls in models:
+            try:
+                modelfields.append(model_cls._meta.get_field(sort))
+            except FieldDoesNotExist:
+                return nodes_qs
+        internal_types = set(modelfield.get_internal_type()
+                             for modelfield in modelfields)
+        if len(internal_types) != 1 or not modelfields[0].concrete or \
+                modelfields[0].is_relation:
+            return nodes_qs
+        content_types = ContentType.objects.get_for_models(*models)
+        sort_value = Case(*[
+            When(content_type=content_types[model_cls], then=Subquery(
+                model_cls._default_manager.filter(pk=OuterRef('object_id')).
+                values(sort)[:1]))
+            for model_cls in models
+        ], output_field=modelfields[0])
+        ordering = '-sort_value' if descending else 'sort_value'
+        return nodes_qs.annotate(sort_value=sort_value).order_by(
+            ordering, 'tree_id', 'lft')
+
     def get_urls(self):
         return [
             url(r'^tree/$', self.admin_site.admin_view(self.json_tree)),
+            url(r'^search/$', self.admin_site.admin_view(self.search_tree)),
             url(r'^move/$', self.admin_site.admin_view(self.move_tree_item)),
+            url(r'^bulk_move/$', self.admin_site.admin_view(self.bulk_move_tree_items)),
             url(r'^edit/$', self.admin_site.admin_view(self.edit_tree_item)),
             url(r'^delete/$', self.admin_site.admin_view(self.delete_tree_item)),
             url(r'^list_children/(\d+)$', self.admin_site.admin_view(self.list_children)),
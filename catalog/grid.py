@@ -11,33 +11,69 @@ from django.utils.html import conditional_escape
 from django.db import models
 
 
+EDITABLE_FIELDS = [
+    'CharField',
+    'IntegerField',
+    'PositiveIntegerField',
+    'BooleanField'
+]
+
+URL_PLACEHOLDER = '__catalog_url_placeholder__'
+
+
+class GridColumn(object):
+    """
+    Field metadata resolved once per model for all rows
+    """
+
+    def __init__(self, model_cls, field_name, admin_cls):
+        self.field_name = field_name
+        self.displayed = field_name in admin_cls.list_display
+        try:
+            self.modelfield = model_cls._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            self.modelfield = None
+        self.editable = self.modelfield is not None and \
+            self.modelfield.get_internal_type() in EDITABLE_FIELDS and \
+            field_name in admin_cls.list_editable
+        self.correct_values = None
+        if isinstance(self.modelfield, (models.IntegerField, models.CharField)) \
+                and self.modelfield.choices:
+            self.correct_values = dict(self.modelfield.choices)
+
+
+class GridModel(object):
+    """
+    Metadata of grid fields and change link of model
+    """
+
+    def __init__(self, model_cls, fields, admin_cls):
+        self.admin_cls = admin_cls
+        self.columns = [GridColumn(model_cls, field_name, admin_cls)
+                        for field_name in fields]
+        self.link = reverse('admin:{0}_{1}_change'.
+                            format(model_cls._meta.app_label,
+                                   model_cls._meta.model_name),
+                            args=(URL_PLACEHOLDER,))
+
+
 class GridField(object):
 
-    EDITABLE_FIELDS = [
-        'CharField',
-        'IntegerField',
-        'PositiveIntegerField',
-        'BooleanField'
-    ]
+    EDITABLE_FIELDS = EDITABLE_FIELDS
 
-    def __init__(self, obj, field_name, admin_cls):
+    def __init__(self, obj, field_name, admin_cls, column=None):
         self.obj = obj
         self.field_name = field_name
         self.admin_cls = admin_cls
+        if column is None:
+            column = GridColumn(obj.__class__, field_name, admin_cls)
+        self.column = column
 
     def editable(self):
         """
         :return: True if field is editable else return False
         """
-        editable = True
-        try:
-            field = self.obj._meta.get_field(self.field_name)
-            if field.get_internal_type() not in self.EDITABLE_FIELDS or \
-                    self.field_name not in self.admin_cls.list_editable:
-                    editable = False
-        except FieldDoesNotExist:
-            editable = False
-        return editable
+        return self.column.editable
 
     def contents(self):
         """
@@ -46,7 +82,7 @@ class GridField(object):
         field_type = 'text'
         value = ''
         correct_values, modelfield = None, None
-        if self.field_name in self.admin_cls.list_display:
+        if self.column.displayed:
             try:
                 modelfield, attr, val = admin.utils.lookup_field(self.field_name, self.obj, self.admin_cls)
             except (AttributeError, ValueError, ObjectDoesNotExist):
@@ -71,38 +107,39 @@ class GridField(object):
                 if isinstance(modelfield, models.BooleanField):
                     field_type = 'checkbox'
                     value = 't' if val else 'f'
-                if isinstance(modelfield,
-                              (models.IntegerField, models.CharField)) \
-                        and modelfield.choices:
+                if self.column.correct_values:
                     field_type = 'select'
                     value = val
-                    correct_values = dict(modelfield.choices)
+                    correct_values = self.column.correct_values
         return field_type, value, correct_values
 
 
 class GridRow(object):
 
-    def __init__(self, obj, fields, admin_cls):
+    def __init__(self, obj, fields, admin_cls, treeitem=None, grid_model=None):
         self.obj = obj
         self.fields = fields
         self.admin_cls = admin_cls
+        self.treeitem = treeitem
+        if grid_model is None:
+            grid_model = GridModel(obj.__class__, fields, admin_cls)
+        self.grid_model = grid_model
 
     def json_data(self):
         """
         :return: JSON with fields data of object
         """
-        link = reverse('admin:{0}_{1}_change'.
-                       format(self.obj.__class__._meta.app_label,
-                              self.obj.__class__.__name__.lower()),
-                       args=(self.obj.id,))
-        data = {'id': self.obj.tree.get().id, 'link': link}
-        for field_name in self.fields:
-            field = GridField(self.obj, field_name, self.admin_cls)
+        link = self.grid_model.link.replace(URL_PLACEHOLDER, str(self.obj.id))
+        treeitem = self.treeitem or self.obj.get_tree_item()
+        data = {'id': treeitem.id, 'link': link}
+        for column in self.grid_model.columns:
+            field = GridField(self.obj, column.field_name, self.admin_cls,
+                              column=column)
             field_type, field_value, correct_values = field.contents()
-            data[field_name] = {
+            data[column.field_name] = {
                 'type': field_type,
                 'value': field_value,
                 'editable': field.editable(),
                 'correct_values': correct_values if correct_values else ''
             }
-        return data
\ No newline at end of file
+        return data
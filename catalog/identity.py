@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class IdentityMap(object):
+    """
+    Loaded tree nodes and content objects of one request. Every node and
+    content object is kept once, so repeated lookups return the same
+    instance without queries
+    """
+    def __init__(self):
+        # id of node -> TreeItem
+        self.nodes = {}
+        # (content_type_id, object_id) -> TreeItem
+        self.object_nodes = {}
+        # (content_type_id, object_id) -> content object
+        self.objects = {}
+
+    def get_node(self, node_id):
+        return self.nodes.get(node_id)
+
+    def get_object_node(self, content_type_id, object_id):
+        return self.object_nodes.get((content_type_id, object_id))
+
+    def get_object(self, content_type_id, object_id):
+        return self.objects.get((content_type_id, object_id))
+
+    def add_node(self, node):
+        """
+        :return: registered node with the same id
+        """
+        node = self.nodes.setdefault(node.id, node)
+        self.object_nodes.setdefault((node.content_type_id, node.object_id), node)
+        return node
+
+    def add_object(self, content_type_id, obj):
+        """
+        :return: registered content object with the same content type and id
+        """
+        return self.objects.setdefault((content_type_id, obj.pk), obj)
+
+    def clear(self):
+        self.nodes.clear()
+        self.object_nodes.clear()
+        self.objects.clear()
+
+
+def get_identity_map():
+    """
+    :return: active IdentityMap object or None
+    """
+    return getattr(_local, 'identity_map', None)
+
+
+def clear_identity_map():
+    """
+    Forget loaded objects after catalog changes
+    """
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.clear()
+
+
+@contextmanager
+def catalog_identity_map():
+    """
+    Share loaded tree nodes and content objects inside the block
+    """
+    previous = get_identity_map()
+    _local.identity_map = IdentityMap()
+    try:
+        yield _local.identity_map
+    finally:
+        _local.identity_map = previous
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, ExitStack
+from functools import wraps
+from django.db import connections
+from django.dispatch import Signal
+
+# sent after every instrumented call while stats are collected
+catalog_call_finished = Signal(providing_args=[
+    "name", "time", "queries", "cache_hits", "cache_misses"])
+
+_local = threading.local()
+
+
+class CatalogStatsCollector(object):
+    """
+    Collects number of calls, time, queries and cache hits and misses
+    of instrumented catalog functions
+    """
+    def __init__(self):
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.stats = OrderedDict()
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting queries
+        """
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def call(self, name):
+        """
+        Record stats of block as one call of `name`. Stats of nested calls
+        are included in stats of outer ones
+        """
+        start = time.perf_counter()
+        queries, cache_hits, cache_misses = \
+            self.queries, self.cache_hits, self.cache_misses
+        try:
+            yield
+        finally:
+            values = {
+                'time': time.perf_counter() - start,
+                'queries': self.queries - queries,
+                'cache_hits': self.cache_hits - cache_hits,
+                'cache_misses': self.cache_misses - cache_misses,
+            }
+            stat = self.stats.setdefault(name, {
+                'calls': 0, 'time': 0.0, 'queries': 0,
+                'cache_hits': 0, 'cache_misses': 0})
+            stat['calls'] += 1
+            for key, value in values.items():
+                stat[key] += value
+            catalog_call_finished.send(sender=self.__class__, name=name,
+                                       **values)
+
+    def server_timing(self):
+        """
+        :return: value of Server-Timing header with collected stats
+        """
+        metrics = []
+        for name, stat in self.stats.items():
+            metrics.append(
+                'catalog-{};dur={:.2f};desc="{} calls, {} queries, '
+                '{} cache hits, {} cache misses"'.format(
+                    name, stat['time'] * 1000, stat['calls'], stat['queries'],
+                    stat['cache_hits'], stat['cache_misses']))
+        return ', '.join(metrics)
+
+
+def get_collector():
+    """
+    :return: active CatalogStatsCollector object or None
+    """
+    return getattr(_local, 'collector', None)
+
+
+@contextmanager
+def collect_catalog_stats(collector=None):
+    """
+    Collect stats of instrumented catalog functions called inside the block
+    :param collector: CatalogStatsCollector object to continue collecting,
+                      new one by default
+    """
+    previous = get_collector()
+    if collector is None:
+        collector = CatalogStatsCollector()
+    _local.collector = collector
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            yield collector
+    finally:
+        _local.collector = previous
+
+
+def instrument(name=None):
+    """
+    Decorator recording stats of function calls when stats are collected.
+    Without collector function is called directly. For generator functions
+    stats of whole iteration are recorded when iteration ends
+    :param name: name of stats, qualified name of function by default
+    """
+    def decorator(func):
+        stats_name = name or func.__qualname__
+
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                collector = getattr(_local, 'collector', None)
+                if collector is None:
+                    yield from func(*args, **kwargs)
+                    return
+                with collector.call(stats_name):
+                    yield from func(*args, **kwargs)
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            collector = getattr(_local, 'collector', None)
+            if collector is None:
+                return func(*args, **kwargs)
+            with collector.call(stats_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(hits=0, misses=0):
+    """
+    Count cache hits and misses of catalog cache
+    """
+    collector = getattr(_local, 'collector', None)
+    if collector is not None:
+        collector.cache_hits += hits
+        collector.cache_misses += misses
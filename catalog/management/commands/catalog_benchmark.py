@@ -0,0 +1,272 @@
+import json
+import time
+import tracemalloc
+import uuid
+from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.template import Context, Template
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+import catalog
+from catalog.models import TreeItem, join_path, bump_catalog_version
+from catalog.utils import get_catalog_models
+from catalog.views import CatalogRootView, CatalogItemView
+
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog-benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic catalog in test database and measure query '
+            'counts, time and memory of catalog views, tags and admin '
+            'endpoints. Results are written as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=3,
+                            help='Depth of generated tree. default: 3')
+        parser.add_argument('--fanout', type=int, default=5,
+                            help='Number of children of every node. default: 5')
+        parser.add_argument('--models', type=int, default=None,
+                            help='Number of catalog models used for nodes. '
+                                 'default: all models of CATALOG_MODELS')
+        parser.add_argument('-o', '--output', default=None,
+                            help='File for JSON results. default: stdout')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Use configured database and cache instead of '
+                                 'test database and locmem cache. Generated '
+                                 'data is rolled back')
+
+    def handle(self, *args, **options):
+        catalog_models = list(get_catalog_models())[:options['models']]
+        inner_models = [model_cls for model_cls in catalog_models
+                        if model_cls.leaf is False]
+        if not inner_models:
+            raise CommandError('At least one catalog model with leaf = False '
+                               'is required')
+        if options['current_db']:
+            results = self.run(catalog_models, inner_models, options)
+        else:
+            old_name = connection.creation.create_test_db(verbosity=0,
+                                                          autoclobber=True)
+            try:
+                with override_settings(CACHES=BENCHMARK_CACHES):
+                    results = self.run(catalog_models, inner_models, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    def run(self, catalog_models, inner_models, options):
+        results = {}
+        with transaction.atomic():
+            nodes = self.generate(catalog_models, inner_models,
+                                  options['depth'], options['fanout'])
+            for name, func, mutating in self.get_targets(nodes):
+                results[name] = self.measure(func, mutating)
+            transaction.set_rollback(True)
+
+        return {
+            'catalog_version': catalog.__version__,
+            'database': connection.vendor,
+            'cache': BENCHMARK_CACHES['default']['BACKEND']
+            if not options['current_db'] else 'default',
+            'params': {
+                'depth': options['depth'],
+                'fanout': options['fanout'],
+                'models': [model_cls._meta.label for model_cls in catalog_models],
+                'nodes': len(nodes),
+            },
+            'results': results,
+        }
+
+    def generate(self, catalog_models, inner_models, depth, fanout):
+        """
+        Create content objects and tree nodes with precomputed MPTT fields
+        :return: list of created TreeItem objects in tree order
+        """
+        prefix = 'bench-{}'.format(uuid.uuid4().hex[:8])
+        nodes = []
+
+        def add_node(parent, level):
+            models_list = inner_models if level < depth else catalog_models
+            node = TreeItem(parent=parent, level=level)
+            node.model_cls = models_list[len(nodes) % len(models_list)]
+            node.slug = '{}-{}'.format(prefix, len(nodes))
+            nodes.append(node)
+            if level < depth:
+                for i in range(fanout):
+                    add_node(node, level + 1)
+            return node
+
+        add_node(None, 0)
+
+        objects = {}
+        for node in nodes:
+            objects.setdefault(node.model_cls, []).append(
+                self.make_object(node.model_cls, node.slug))
+        object_ids = {}
+        for model_cls, instances in objects.items():
+            model_cls._default_manager.bulk_create(instances, batch_size=500)
+            object_ids.update(model_cls._default_manager.filter(
+                slug__startswith=prefix).values_list('slug', 'pk'))
+
+        tree_id = (TreeItem.objects.aggregate(value=Max('tree_id'))['value'] or 0) + 1
+        next_id = (TreeItem.objects.aggregate(value=Max('id'))['value'] or 0) + 1
+        counter = 1
+        stack = []
+        for node in nodes:
+            while stack and stack[-1].level >= node.level:
+                stack.pop().rght = counter
+                counter += 1
+            node.id = next_id
+            next_id += 1
+            node.parent_id = node.parent.id if node.parent else None
+            node.tree_id = tree_id
+            node.lft = counter
+            counter += 1
+            node.content_type = ContentType.objects.get_for_model(node.model_cls)
+            node.object_id = object_ids[node.slug]
+            node.path = join_path(node.parent.path if node.parent else '', node.slug)
+            stack.append(node)
+        while stack:
+            stack.pop().rght = counter
+            counter += 1
+        TreeItem.objects.bulk_create(nodes, batch_size=500)
+        return nodes
+
+    def make_object(self, model_cls, slug):
+        """
+        :return: unsaved content object with filled required fields
+        """
+        instance = model_cls(slug=slug, show=True)
+        for field in model_cls._meta.concrete_fields:
+            if field.primary_key or field.null or field.has_default() or \
+                    field.name in ('slug', 'show'):
+                continue
+            if isinstance(field, (models.CharField, models.TextField)):
+                setattr(instance, field.attname, slug)
+            elif isinstance(field, (models.IntegerField, models.FloatField,
+                                    models.DecimalField)):
+                setattr(instance, field.attname, 0)
+            elif isinstance(field, models.BooleanField):
+                setattr(instance, field.attname, False)
+            elif isinstance(field, models.DateTimeField):
+                setattr(instance, field.attname, timezone.now())
+            elif isinstance(field, models.DateField):
+                setattr(instance, field.attname, timezone.now().date())
+        return instance
+
+    def get_targets(self, nodes):
+        """
+        :return: list of (name, callable, mutating) for measurement
+        """
+        factory = RequestFactory()
+        catalog_admin = admin.site._registry[TreeItem]
+        root = nodes[0]
+        section = nodes[1]
+        deepest = nodes[-1]
+        parent_of_deepest = deepest.parent
+        leaf_object = deepest.model_cls._default_manager.get(pk=deepest.object_id)
+        section_object = section.model_cls._default_manager.get(pk=section.object_id)
+
+        def render(source, instance):
+            def func():
+                return Template('{% load catalog_tags %}' + source).render(
+                    Context({'object': instance}))
+            return func
+
+        def view(view_cls, **kwargs):
+            def func():
+                response = view_cls.as_view()(factory.get('/'), **kwargs)
+                return response.render()
+            return func
+
+        def admin_get(method, params=None, *args):
+            def func():
+                response = getattr(catalog_admin, method)(
+                    factory.get('/', params or {}), *args)
+                if response.streaming:
+                    return b''.join(response.streaming_content)
+                return response.content
+            return func
+
+        def admin_post(method, data):
+            def func():
+                return getattr(catalog_admin, method)(
+                    factory.post('/', data)).content
+            return func
+
+        return [
+            ('CatalogRootView', view(CatalogRootView), False),
+            ('CatalogItemView', view(CatalogItemView, path=deepest.path), False),
+            ('render_catalog_tree expanded',
+             render('{% render_catalog_tree type "expanded" %}', leaf_object), False),
+            ('render_catalog_tree collapsed',
+             render('{% render_catalog_tree type "collapsed" %}', leaf_object), False),
+            ('render_catalog_tree drilldown',
+             render('{% render_catalog_tree type "drilldown" %}', leaf_object), False),
+            ('catalog_children',
+             render('{% catalog_children for object %}', section_object), False),
+            ('catalog_children descendants all',
+             render('{% catalog_children for object descendants all %}',
+                    section_object), False),
+            ('catalog_breadcrumbs',
+             render('{% catalog_breadcrumbs object %}', leaf_object), False),
+            ('json_tree', admin_get('json_tree'), False),
+            ('json_tree lazy', admin_get('json_tree', {'id': root.id}), False),
+            ('list_children',
+             admin_get('list_children', None, str(parent_of_deepest.id)), False),
+            ('move_tree_item', admin_post('move_tree_item', {
+                'item_id': deepest.id,
+                'target_id': section.id,
+                'position': 'last-child',
+            }), True),
+            ('delete_tree_item', admin_post('delete_tree_item', {
+                'item_id': section.id,
+            }), True),
+        ]
+
+    def measure(self, func, mutating):
+        """
+        Target is run in savepoint which is rolled back, so changes and
+        database errors of one target do not affect others
+        :return: dict with query count, time in seconds and peak memory in
+                 bytes for cold cache and, for read-only targets, warm cache
+        """
+        result = {}
+        with transaction.atomic():
+            try:
+                bump_catalog_version()
+                tracemalloc.start()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    func()
+                    result['time'] = time.perf_counter() - start
+                result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+                result['queries'] = len(queries)
+                if not mutating:
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        func()
+                        result['warm_time'] = time.perf_counter() - start
+                    result['warm_queries'] = len(queries)
+            except Exception as e:
+                result['error'] = repr(e)
+            finally:
+                tracemalloc.stop()
+                transaction.set_rollback(True)
+        return result
@@ -1,12 +1,19 @@
 from django.core.management.base import BaseCommand
-from catalog.models import TreeItem
+from catalog.models import invalidate_catalog_now
+from catalog.utils import warm_url_cache
 import sys
 
 
 class Command(BaseCommand):
     help = ('Delete all cache of catalog models')
 
+    def add_arguments(self, parser):
+        parser.add_argument('--warm', action='store_true',
+                            help='Cache urls of catalog objects again '
+                                 'after deleting')
+
     def handle(self, *args, **options):
-        for item in TreeItem.objects.root_nodes():
-            item.content_object.clear_cache()
-        sys.stdout.write("\rCache deleted\n")
\ No newline at end of file
+        invalidate_catalog_now()
+        sys.stdout.write("\rCache deleted\n")
+        if options['warm']:
+            sys.stdout.write("\rCached {} urls\n".format(warm_url_cache()))
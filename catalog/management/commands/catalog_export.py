@@ -0,0 +1,67 @@
+import json
+import sys
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from catalog.models import TreeItem
+from catalog.utils import prefetch_content_objects
+
+
+class Command(BaseCommand):
+    help = ('Export catalog tree as JSON Lines: one record per tree node '
+            'in tree order with content object fields')
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default=None,
+                            help='Output file. default: stdout')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of nodes loaded at once. default: 500')
+
+    def handle(self, *args, **options):
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                count = self.export(stream, options['chunk_size'])
+            sys.stdout.write("\rExported {} tree nodes\n".format(count))
+        else:
+            self.export(sys.stdout, options['chunk_size'])
+
+    def export(self, stream, chunk_size):
+        """
+        Write records of all tree nodes to `stream`. Nodes are read by
+        chunks, so memory does not depend on catalog size
+        :return: number of exported nodes
+        """
+        count = 0
+        nodes = TreeItem.objects.all().iterator(chunk_size=chunk_size)
+        chunk = list(islice(nodes, chunk_size))
+        while chunk:
+            objects = {item.id: item.content_object
+                       for item in prefetch_content_objects(chunk)}
+            for item in chunk:
+                if item.id not in objects:
+                    raise CommandError('Content object of tree node {} does '
+                                       'not exist'.format(item.id))
+                stream.write(json.dumps(
+                    self.get_record(item, objects[item.id])) + '\n')
+                count += 1
+            chunk = list(islice(nodes, chunk_size))
+        return count
+
+    def get_record(self, item, instance):
+        """
+        :return: dict with node id, parent id, model label, primary key
+                 and serialized fields of content object
+        """
+        fields = {}
+        for field in instance._meta.concrete_fields:
+            if field.primary_key:
+                continue
+            value = field.value_from_object(instance)
+            fields[field.attname] = None if value is None \
+                else field.value_to_string(instance)
+        return {
+            'id': item.id,
+            'parent': item.parent_id,
+            'model': instance._meta.label_lower,
+            'pk': instance._meta.pk.value_to_string(instance),
+            'fields': fields,
+        }
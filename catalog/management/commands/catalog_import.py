@@ -0,0 +1,146 @@
+import json
+import sys
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from catalog.models import TreeItem, join_path, invalidate_catalog_now
+from catalog.utils import get_catalog_models
+
+
+class Command(BaseCommand):
+    help = ('Import catalog tree from JSON Lines written by catalog_export. '
+            'Imported trees are appended to existing catalog, content objects '
+            'keep their primary keys, content objects and tree nodes are '
+            'created in batches with precomputed tree fields')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Input file, `-` for stdin')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of objects created at once. '
+                                 'default: 500')
+
+    def handle(self, *args, **options):
+        if options['input'] == '-':
+            count = self.load(sys.stdin, options['batch_size'])
+        else:
+            with open(options['input']) as stream:
+                count = self.load(stream, options['batch_size'])
+        invalidate_catalog_now()
+        sys.stdout.write("\rImported {} tree nodes\n".format(count))
+
+    def load(self, stream, batch_size):
+        """
+        Create content objects and tree nodes from records of `stream`.
+        Records are read one by one and saved by batches, only current branch
+        is kept in memory. Tree fields are numbered from parent links, so
+        gaps in numbering of exported tree do not matter. Content objects
+        keep primary keys of records, so references between imported objects
+        stay valid. Models signals are not sent
+        :return: number of created nodes
+        """
+        catalog_models = {model_cls._meta.label_lower: model_cls
+                          for model_cls in get_catalog_models()}
+        with transaction.atomic():
+            next_ids = {}
+            for model_cls in list(catalog_models.values()) + [TreeItem]:
+                next_ids[model_cls] = (model_cls._default_manager.aggregate(
+                    value=Max('pk'))['value'] or 0) + 1
+            tree_id = TreeItem.objects.aggregate(value=Max('tree_id'))['value'] or 0
+            pending = {}
+            # open nodes of current branch: (source id, node, path)
+            stack = []
+            counter = 0
+            count = 0
+
+            for line_number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    model_cls = catalog_models[record['model']]
+                    parent = record['parent']
+                    fields = record['fields']
+                    pk = record.get('pk')
+                except (ValueError, KeyError, TypeError):
+                    raise CommandError('Line {}: invalid record'.format(line_number))
+                while stack and stack[-1][0] != parent:
+                    counter = self.close(stack.pop()[1], counter)
+                if parent is not None and not stack:
+                    raise CommandError('Line {}: records are not in tree '
+                                       'order'.format(line_number))
+                if not stack:
+                    tree_id += 1
+                    counter = 1
+
+                if pk is None:
+                    pk = next_ids[model_cls]
+                    next_ids[model_cls] += 1
+                instance = model_cls(pk=model_cls._meta.pk.to_python(pk))
+                for field in model_cls._meta.concrete_fields:
+                    if field.attname in fields and not field.primary_key:
+                        value = fields[field.attname]
+                        setattr(instance, field.attname,
+                                None if value is None else field.to_python(value))
+                slug = getattr(instance, 'slug', None) or None
+                path = join_path(stack[-1][2] if stack else '', slug)
+                show = getattr(instance, 'show', True)
+                visible = show and (stack[-1][1].visible if stack else True)
+                # rght is set when all descendants are read
+                node = TreeItem(
+                    id=next_ids[TreeItem],
+                    parent_id=stack[-1][1].id if stack else None,
+                    tree_id=tree_id, level=len(stack), lft=counter, rght=0,
+                    content_type=ContentType.objects.get_for_model(model_cls),
+                    object_id=instance.pk, slug=slug, path=path,
+                    search_text=instance.get_search_text(),
+                    show=show, visible=visible)
+                next_ids[TreeItem] += 1
+                counter += 1
+                count += 1
+                stack.append((record['id'], node, path))
+
+                pending.setdefault(model_cls, []).append(instance)
+                pending.setdefault(TreeItem, []).append(node)
+                if len(pending[TreeItem]) >= batch_size:
+                    self.flush(pending, batch_size)
+            while stack:
+                counter = self.close(stack.pop()[1], counter)
+            self.flush(pending, batch_size)
+
+            sequence_sql = connection.ops.sequence_reset_sql(
+                no_style(), list(catalog_models.values()) + [TreeItem])
+            if sequence_sql:
+                with connection.cursor() as cursor:
+                    for sql in sequence_sql:
+                        cursor.execute(sql)
+        return count
+
+    def close(self, node, counter):
+        """
+        Set right bound of node after all its descendants. Nodes of current
+        branch saved by previous batch are updated with one query
+        :return: next value of tree counter
+        """
+        node.rght = counter
+        if not node._state.adding:
+            TreeItem.objects.filter(pk=node.pk).update(rght=counter)
+        return counter + 1
+
+    def flush(self, pending, batch_size):
+        """
+        Save pending objects, content objects before tree nodes
+        """
+        nodes = pending.pop(TreeItem, [])
+        for model_cls, instances in pending.items():
+            existing = list(model_cls._default_manager.filter(
+                pk__in=[instance.pk for instance in instances]).
+                values_list('pk', flat=True)[:10])
+            if existing:
+                raise CommandError('{} objects with primary keys {} already '
+                                   'exist'.format(model_cls._meta.label,
+                                                  ', '.join(map(str, existing))))
+            model_cls._default_manager.bulk_create(instances, batch_size=batch_size)
+        TreeItem.objects.bulk_create(nodes, batch_size=batch_size)
+        pending.clear()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from catalog.models import invalidate_catalog_now
+from catalog.utils import rebuild_tree_fields
+import sys
+
+
+class Command(BaseCommand):
+    help = ('Recompute slugs, full paths, search text and visibility stored '
+            'in catalog tree nodes from their content objects')
+
+    def handle(self, *args, **options):
+        updated = rebuild_tree_fields()
+        invalidate_catalog_now()
+        sys.stdout.write("\rUpdated {} tree nodes\n".format(updated))
@@ -0,0 +1,61 @@
+import os
+import sys
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from catalog.sitemaps import get_sitemaps
+
+
+class DomainSite(object):
+    """
+    Site with domain given in command line, used like RequestSite
+    """
+    def __init__(self, domain):
+        self.domain = self.name = domain
+
+
+class Command(BaseCommand):
+    help = ('Render sitemap XML files of catalog models and sitemap index '
+            'to directory for static serving')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Directory for sitemap files')
+        parser.add_argument('--base-url', default='/',
+                            help='Url of output directory used in sitemap '
+                                 'index, for example '
+                                 'https://example.com/sitemaps/. default: /')
+        parser.add_argument('--domain',
+                            help='Domain of catalog urls, for example '
+                                 'example.com. default: domain of current '
+                                 'site of django.contrib.sites')
+        parser.add_argument('--protocol', default='http',
+                            help='Protocol of catalog urls. default: http')
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        base_url = options['base_url'].rstrip('/') + '/'
+        if options['domain']:
+            site = DomainSite(options['domain'])
+        elif apps.is_installed('django.contrib.sites'):
+            # current site is found by sitemaps
+            site = None
+        else:
+            raise CommandError('--domain is required without '
+                               'django.contrib.sites')
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        locations = []
+        for section, sitemap in sorted(get_sitemaps().items()):
+            for page in sitemap.paginator.page_range:
+                filename = 'sitemap-{}-{}.xml'.format(section, page)
+                urls = sitemap.get_urls(page=page, site=site,
+                                        protocol=options['protocol'])
+                self.write(output_dir, filename, 'sitemap.xml', {'urlset': urls})
+                locations.append(base_url + filename)
+        self.write(output_dir, 'sitemap.xml', 'sitemap_index.xml',
+                   {'sitemaps': locations})
+        sys.stdout.write("\rRendered {} sitemap files\n".format(len(locations)))
+
+    def write(self, output_dir, filename, template, context):
+        with open(os.path.join(output_dir, filename), 'w') as f:
+            f.write(render_to_string(template, context))
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from catalog.models import TreeItem
+from catalog.utils import warm_url_cache
+import sys
+
+
+def warm_trees(tree_ids, batch_size):
+    """
+    Warm urls of trees in worker thread with own database connection
+    """
+    try:
+        return warm_url_cache(batch_size=batch_size, tree_ids=tree_ids)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Cache urls of all catalog objects from full paths stored in '
+            'catalog tree')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of urls written to cache at once. '
+                                 'default: 500')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of threads warming separate trees. '
+                                 'default: 1')
+
+    def handle(self, *args, **options):
+        sys.stdout.write("\rCached {} urls\n".format(
+            self.warm(options['batch_size'], options['workers'])))
+
+    def warm(self, batch_size, workers=1):
+        """
+        :return: number of cached urls
+        """
+        if workers <= 1:
+            return warm_url_cache(batch_size=batch_size)
+        tree_ids = list(TreeItem.objects.root_nodes().
+                        values_list('tree_id', flat=True))
+        parts = [tree_ids[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(warm_trees, [part for part in parts if part],
+                                    [batch_size] * workers))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+from .identity import catalog_identity_map
+from .instrumentation import collect_catalog_stats
+
+logger = logging.getLogger('catalog.instrumentation')
+
+
+class CatalogIdentityMapMiddleware(object):
+    """
+    Share loaded catalog tree nodes and content objects within request
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with catalog_identity_map():
+            return self.get_response(request)
+
+
+class CatalogInstrumentationMiddleware(object):
+    """
+    Collect stats of catalog calls within request, add them to
+    Server-Timing header of response and log them
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_catalog_stats() as collector:
+            response = self.get_response(request)
+        if collector.stats:
+            server_timing = collector.server_timing()
+            if response.has_header('Server-Timing'):
+                server_timing = response['Server-Timing'] + ', ' + server_timing
+            response['Server-Timing'] = server_timing
+        if response.streaming:
+            # content is generated after headers are sent, stats of
+            # streaming are only logged
+            response.streaming_content = self.stream(
+                request, response.streaming_content, collector)
+        else:
+            self.log(request, collector)
+        return response
+
+    def stream(self, request, content, collector):
+        """
+        Iterate over streaming content collecting stats, log stats when
+        content ends
+        """
+        try:
+            with collect_catalog_stats(collector):
+                yield from content
+        finally:
+            self.log(request, collector)
+
+    def log(self, request, collector):
+        if collector.stats:
+            logger.info(json.dumps({'path': request.path,
+                                    'stats': collector.stats}),
+                        extra={'catalog_stats': collector.stats})
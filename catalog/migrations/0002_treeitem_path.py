@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 2.2.28 on 2026-10-17 13:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    """
+    Store full path of every existing tree node
+    """
+    TreeItem = apps.get_model('catalog', 'TreeItem')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    paths = {}
+    for item in TreeItem.objects.order_by('tree_id', 'lft'):
+        content_type = ContentType.objects.get_for_id(item.content_type_id)
+        try:
+            model_cls = apps.get_model(content_type.app_label, content_type.model)
+            slug = model_cls._default_manager.filter(pk=item.object_id).values_list('slug', flat=True).first()
+        except LookupError:
+            slug = None
+        parts = [paths.get(item.parent_id, ''), slug]
+        item.path = '/'.join(part for part in parts if part)
+        paths[item.id] = item.path
+        item.save(update_fields=['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treeitem',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1000, verbose_name='Full path'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
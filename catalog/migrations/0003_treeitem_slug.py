@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 2.2.28 on 2026-10-17 13:37
+from __future__ import unicode_literals
+
+from django.db import migrations, models, IntegrityError
+
+
+def get_content_slugs(apps, TreeItem):
+    """
+    :return: dict of slugs of content objects by content type and object id
+    """
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    content_type_ids = TreeItem.objects.values_list('content_type', flat=True).distinct()
+    slugs = {}
+    for content_type in ContentType.objects.filter(id__in=list(content_type_ids)):
+        try:
+            model_cls = apps.get_model(content_type.app_label, content_type.model)
+        except LookupError:
+            continue
+        slugs[content_type.id] = dict(model_cls._default_manager.values_list('pk', 'slug'))
+    return slugs
+
+
+def check_sibling_slugs(apps, schema_editor):
+    """
+    Stop before slug field and unique constraint are added if some siblings
+    have the same slug, slugs of content objects should be changed then
+    """
+    TreeItem = apps.get_model('catalog', 'TreeItem')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    slugs = get_content_slugs(apps, TreeItem)
+    siblings = {}
+    for node_id, parent_id, content_type_id, object_id in TreeItem.objects.\
+            filter(parent__isnull=False).order_by('id').values_list(
+                'id', 'parent', 'content_type', 'object_id'):
+        slug = slugs.get(content_type_id, {}).get(object_id)
+        if slug:
+            siblings.setdefault((parent_id, slug), []).append(
+                (node_id, content_type_id, object_id))
+    labels = {content_type.id: '{}.{}'.format(content_type.app_label,
+                                              content_type.model)
+              for content_type in ContentType.objects.all()}
+    conflicts = []
+    for (parent_id, slug), nodes in sorted(siblings.items()):
+        if len(nodes) > 1:
+            conflicts.append('parent node {}, slug "{}": {}'.format(
+                parent_id, slug, ', '.join(
+                    '{} #{} (node {})'.format(
+                        labels[content_type_id], object_id, node_id)
+                    for node_id, content_type_id, object_id in nodes)))
+    if conflicts:
+        raise IntegrityError(
+            'Catalog objects with the same parent have the same slug, change '
+            'slugs of these objects and run migrate again:\n' +
+            '\n'.join(conflicts[:20]))
+
+
+def fill_slugs(apps, schema_editor):
+    """
+    Store slug of content object in every existing tree node
+    """
+    TreeItem = apps.get_model('catalog', 'TreeItem')
+    slugs = get_content_slugs(apps, TreeItem)
+    for content_type_id, model_slugs in slugs.items():
+        items = list(TreeItem.objects.filter(content_type=content_type_id))
+        for item in items:
+            item.slug = model_slugs.get(item.object_id) or None
+        TreeItem.objects.bulk_update(items, ['slug'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_treeitem_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_sibling_slugs, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='treeitem',
+            name='slug',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, verbose_name='Slug'),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='treeitem',
+            unique_together={('parent', 'slug')},
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 2.2.28 on 2026-10-17 13:45
+from __future__ import unicode_literals
+
+from django.db import migrations, models, transaction, DatabaseError
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    Create trigram index for search on PostgreSQL if pg_trgm is available
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(
+                'CREATE INDEX catalog_treeitem_search_text_trgm '
+                'ON catalog_treeitem USING gin (search_text gin_trgm_ops)')
+    except DatabaseError:
+        pass
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS catalog_treeitem_search_text_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_treeitem_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treeitem',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Search text'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 2.2.28 on 2026-10-17 14:02
+from __future__ import unicode_literals
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import migrations, models
+
+
+def fill_visibility(apps, schema_editor):
+    """
+    Store `show` flag of content objects in tree nodes and hide
+    subtrees of hidden nodes
+    """
+    TreeItem = apps.get_model('catalog', 'TreeItem')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    content_type_ids = TreeItem.objects.values_list('content_type', flat=True).distinct()
+    for content_type in ContentType.objects.filter(id__in=list(content_type_ids)):
+        try:
+            model_cls = apps.get_model(content_type.app_label, content_type.model)
+            model_cls._meta.get_field('show')
+        except (LookupError, FieldDoesNotExist):
+            continue
+        hidden_ids = list(model_cls._default_manager.filter(show=False).
+                          values_list('pk', flat=True))
+        for i in range(0, len(hidden_ids), 500):
+            TreeItem.objects.filter(content_type=content_type,
+                                    object_id__in=hidden_ids[i:i + 500]).\
+                update(show=False, visible=False)
+
+    last = None
+    for tree_id, lft, rght in TreeItem.objects.filter(show=False).\
+            order_by('tree_id', 'lft').values_list('tree_id', 'lft', 'rght'):
+        if last is not None and last[0] == tree_id and last[2] > lft:
+            continue
+        TreeItem.objects.filter(tree_id=tree_id, lft__gt=lft, rght__lt=rght).\
+            update(visible=False)
+        last = (tree_id, lft, rght)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_treeitem_search_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treeitem',
+            name='show',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Show on site'),
+        ),
+        migrations.AddField(
+            model_name='treeitem',
+            name='visible',
+            field=models.BooleanField(db_index=True, default=True, editable=False, help_text='Node and all its ancestors are shown on site', verbose_name='Visible on site'),
+        ),
+        migrations.RunPython(fill_visibility, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 2.2.28 on 2026-10-17 14:17
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('catalog', '0005_treeitem_visible'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='treeitem',
+            index_together={('content_type', 'object_id')},
+        ),
+    ]
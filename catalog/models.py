@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
+import threading
+import time
+from functools import partial
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.urls import reverse, NoReverseMatch
 from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
-from django.db import models
+from django.db import models, router, transaction, connections, \
+    DEFAULT_DB_ALIAS
+from django.db.models import Case, Exists, F, OuterRef, When
 from mptt.models import MPTTModel
+from mptt.exceptions import InvalidMove
+from .identity import get_identity_map, clear_identity_map
+from .instrumentation import instrument, record_cache
 
 try:
     from tinymce.models import HTMLField
@@ -13,11 +22,188 @@ except ImportError:
     from django.db.models.fields import TextField as HTMLField
 
 
+CATALOG_VERSION_KEY = 'catalog_tree_version'
+CATALOG_FRAGMENT_VERSION_KEY = 'catalog_fragment_version'
+DELETE_BATCH_SIZE = 500
+MOVE_POSITIONS = ('first-child', 'last-child', 'left', 'right')
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# scheduled catalog invalidations by database alias: generation and
+# whether tree structure has changed
+_invalidation = threading.local()
+
+
+def get_scheduled_invalidations():
+    """
+    :return: dict of [generation, structure] lists of scheduled
+             invalidations by database alias of current thread
+    """
+    if not hasattr(_invalidation, 'scheduled'):
+        _invalidation.scheduled = {}
+    return _invalidation.scheduled
+
+
+def get_version(key):
+    """
+    :return: value of version key, initialized with current time
+    """
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    """
+    Change value of version key
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def get_catalog_version():
+    """
+    :return: current version of catalog tree structure: slugs, paths,
+             visibility and position of nodes. Part of keys of cached urls,
+             paths and tree snapshot
+    """
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def get_fragment_version():
+    """
+    :return: current version of catalog content, part of keys of cached
+             catalog fragments and breadcrumbs
+    """
+    return get_version(CATALOG_FRAGMENT_VERSION_KEY)
+
+
+def get_catalog_cache_timeout():
+    """
+    :return: timeout of catalog cache keys from CATALOG_CACHE_TIMEOUT setting.
+             Keys of old catalog versions are not deleted, they expire
+    """
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', CATALOG_CACHE_TIMEOUT)
+
+
+def bump_catalog_version(structure=True):
+    """
+    Invalidate catalog cache keys by changing fragment version and, if
+    tree `structure` has changed, version of catalog tree
+    """
+    clear_identity_map()
+    if structure:
+        bump_version(CATALOG_VERSION_KEY)
+    bump_version(CATALOG_FRAGMENT_VERSION_KEY)
+
+
+def flush_catalog_invalidation(using=DEFAULT_DB_ALIAS, generation=None):
+    """
+    Invalidate catalog cache scheduled by `invalidate_catalog`, in
+    background thread if CATALOG_ASYNC_INVALIDATION setting is True.
+    Callbacks scheduled in one transaction share `generation`, only the
+    first of them invalidates cache
+    """
+    structure = True
+    if generation is not None:
+        scheduled = get_scheduled_invalidations()
+        current, structure = scheduled.get(using, (0, True))
+        if current != generation:
+            return
+        scheduled[using] = [generation + 1, False]
+    if getattr(settings, 'CATALOG_ASYNC_INVALIDATION', False):
+        threading.Thread(target=invalidate_catalog_in_thread,
+                         args=(structure,), daemon=True).start()
+    else:
+        invalidate_catalog_now(structure)
+
+
+def invalidate_catalog_now(structure=True):
+    """
+    Change catalog versions and notify receivers of
+    `catalog_cache_invalidated` signal
+    """
+    from .signals import catalog_cache_invalidated
+
+    bump_catalog_version(structure)
+    catalog_cache_invalidated.send(sender=TreeItem, structure=structure)
+
+
+def invalidate_catalog_in_thread(structure=True):
+    """
+    Invalidate catalog cache in background thread and close database
+    connections opened by signal receivers
+    """
+    try:
+        invalidate_catalog_now(structure)
+    finally:
+        connections.close_all()
+
+
+def invalidate_catalog(using=None, structure=True):
+    """
+    Schedule invalidation of catalog cache after commit of current
+    transaction. Invalidations of one transaction are coalesced, tree
+    version is changed if any of them changed tree `structure`. Without
+    transaction cache is invalidated at once. Objects of identity map are
+    forgotten at once
+    """
+    clear_identity_map()
+    using = using or DEFAULT_DB_ALIAS
+    scheduled = get_scheduled_invalidations().setdefault(using, [0, False])
+    scheduled[1] = scheduled[1] or structure
+    transaction.on_commit(
+        partial(flush_catalog_invalidation, using, scheduled[0]), using=using)
+
+
+def join_path(*parts):
+    """
+    Join url path parts skipping empty ones
+    """
+    return '/'.join(part for part in parts if part)
+
+
+def replace_path_prefix(path, old_prefix, new_prefix):
+    """
+    Replace `old_prefix` of descendant `path` with `new_prefix`
+    """
+    suffix = path[len(old_prefix):].lstrip('/') if old_prefix else path
+    return join_path(new_prefix, suffix)
+
+
+class CatalogGenericForeignKey(GenericForeignKey):
+    """
+    Generic foreign key returning content objects shared by identity map
+    """
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        identity_map = get_identity_map()
+        if identity_map is None:
+            return super(CatalogGenericForeignKey, self).__get__(instance, cls)
+        content_type_id = getattr(instance, self.ct_field + '_id')
+        object_id = getattr(instance, self.fk_field)
+        if not self.is_cached(instance):
+            obj = identity_map.get_object(content_type_id, object_id)
+            if obj is not None:
+                self.set_cached_value(instance, obj)
+        obj = super(CatalogGenericForeignKey, self).__get__(instance, cls)
+        if obj is not None:
+            identity_map.add_object(content_type_id, obj)
+        return obj
+
+
 class TreeItem(MPTTModel):
     class Meta:
         verbose_name = _('Catalog structure')
         verbose_name_plural = _('Catalog structure')
         ordering = ['tree_id', 'lft']
+        unique_together = [('parent', 'slug')]
+        index_together = [('content_type', 'object_id')]
 
     parent = models.ForeignKey('self', related_name='children',
                                verbose_name=_('Parent node'), null=True,
@@ -25,7 +211,20 @@ class TreeItem(MPTTModel):
 
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey()
+    content_object = CatalogGenericForeignKey()
+    slug = models.CharField(verbose_name=_('Slug'), max_length=255,
+                            null=True, blank=True, editable=False)
+    path = models.CharField(verbose_name=_('Full path'), max_length=1000,
+                            db_index=True, blank=True, default='',
+                            editable=False)
+    search_text = models.TextField(verbose_name=_('Search text'), blank=True,
+                                   default='', editable=False)
+    show = models.BooleanField(verbose_name=_('Show on site'), default=True,
+                               editable=False)
+    visible = models.BooleanField(verbose_name=_('Visible on site'),
+                                  default=True, db_index=True, editable=False,
+                                  help_text=_('Node and all its ancestors '
+                                              'are shown on site'))
 
     def __str__(self):
         if self.content_object:
@@ -35,20 +234,360 @@ class TreeItem(MPTTModel):
 
     def move_to(self, target, position='first-child'):
         """
-        Clear cache when moving
+        Rebuild full paths and visibility and clear cache when moving
         """
-        self.content_object.clear_cache()
         super(TreeItem, self).move_to(target, position=position)
+        self.update_path(self.get_slug())
+        self.update_visibility()
+        self.content_object.clear_cache()
+
+    def delete(self, using=None, keep_parents=False):
+        """
+        Delete node with all descendants and their content objects in bulk:
+        tree nodes with one range query, content objects with one query
+        per model. Per-node signals are not sent for tree nodes,
+        `subtree_deleted` signal is sent once instead. If other models refer
+        to tree nodes, nodes are deleted by Django collector to handle
+        `on_delete` of their relations
+        """
+        from .signals import subtree_deleted
+
+        using = using or router.db_for_write(TreeItem, instance=self)
+        with transaction.atomic(using=using):
+            self._mptt_refresh()
+            nodes = TreeItem.objects.using(using).filter(
+                tree_id=self.tree_id, lft__gte=self.lft, rght__lte=self.rght)
+            object_ids = {}
+            for content_type_id, object_id in nodes.values_list(
+                    'content_type_id', 'object_id'):
+                object_ids.setdefault(content_type_id, []).append(object_id)
+            objects = {}
+            for content_type_id, ids in object_ids.items():
+                model_cls = ContentType.objects.get_for_id(content_type_id).model_class()
+                if model_cls is not None:
+                    objects[model_cls] = ids
+
+            if not self.can_bulk_delete():
+                deleted = super(TreeItem, self).delete(using, keep_parents)
+            else:
+                deleted = self.bulk_delete(using, objects)
+
+        invalidate_catalog(using)
+        subtree_deleted.send(sender=TreeItem, instance=self, objects=objects)
+        return deleted
+    delete.alters_data = True
+
+    @classmethod
+    def can_bulk_delete(cls):
+        """
+        :return: True if only children nodes refer to tree nodes, so subtree
+                 can be deleted without Django collector
+        """
+        return all(relation.related_model is TreeItem and
+                   relation.field.name == 'parent'
+                   for relation in cls._meta.related_objects)
+
+    def bulk_delete(self, using, objects):
+        """
+        Delete subtree of node with one query and close gap in tree with
+        another one, then delete content objects with one query per model
+        :param objects: dict of model class to list of content object ids
+        :return: number of deleted objects and dict with numbers of deleted
+                 objects per model label
+        """
+        connection = connections[using]
+        nodes = TreeItem.objects.using(using).filter(
+            tree_id=self.tree_id, lft__gte=self.lft, rght__lte=self.rght)
+        if not connection.features.can_defer_constraint_checks:
+            nodes.update(parent=None)
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE {} = %s AND {} >= %s AND {} <= %s'.format(
+                    qn(TreeItem._meta.db_table),
+                    qn(TreeItem._meta.get_field('tree_id').column),
+                    qn(TreeItem._meta.get_field('lft').column),
+                    qn(TreeItem._meta.get_field('rght').column)),
+                [self.tree_id, self.lft, self.rght])
+            deleted_nodes = cursor.rowcount
+        gap = self.rght - self.lft + 1
+        TreeItem.objects.using(using).filter(
+            tree_id=self.tree_id, rght__gt=self.rght).update(
+            lft=Case(When(lft__gt=self.rght, then=F('lft') - gap),
+                     default=F('lft')),
+            rght=F('rght') - gap)
+
+        deleted = {self._meta.label: deleted_nodes}
+        for model_cls, ids in objects.items():
+            for i in range(0, len(ids), DELETE_BATCH_SIZE):
+                count, per_model = model_cls._base_manager.using(using).\
+                    filter(pk__in=ids[i:i + DELETE_BATCH_SIZE]).delete()
+                for label, value in per_model.items():
+                    deleted[label] = deleted.get(label, 0) + value
+        return sum(deleted.values()), deleted
+    delete.alters_data = True
+
+    @classmethod
+    def bulk_move(cls, operations, using=None):
+        """
+        Move many nodes in one transaction. Moves are applied in given order
+        to affected trees loaded in memory, then slugs of all changed levels
+        are checked at once against final state and affected trees are
+        renumbered with one bulk update. Catalog urls are invalidated once,
+        `content_objects_bulk_moved` signal is sent once after all moves are
+        saved, per-node `content_object_moved`,
+        `content_object_parent_changed` and mptt `node_moved` signals are
+        not sent.
+        :param operations: list of (node, target, position) tuples, node and
+                           target are TreeItem objects or their ids, position
+                           is one of first-child, last-child, left, right
+        :return: list of (content_object, parent_from, parent_to) tuples
+                 for moved nodes
+        :raise InvalidMove: if any move is invalid, nothing is changed then
+        """
+        from .signals import content_objects_bulk_moved
+        from .utils import prefetch_content_objects
+
+        operations = [(getattr(node, 'pk', node), getattr(target, 'pk', target),
+                       position) for node, target, position in operations]
+        if not operations:
+            return []
+        using = using or router.db_for_write(TreeItem)
+        with transaction.atomic(using=using):
+            manager = TreeItem.objects.using(using)
+            ids = set()
+            for node_id, target_id, position in operations:
+                ids.update([node_id, target_id])
+            tree_ids = set(manager.filter(pk__in=ids).
+                           values_list('tree_id', flat=True).distinct())
+            rows = manager.select_for_update().filter(tree_id__in=tree_ids).\
+                order_by('tree_id', 'lft').values_list(
+                    'id', 'parent_id', 'tree_id', 'level', 'lft', 'rght',
+                    'slug', 'path', 'show', 'visible')
+            nodes = {row[0]: row for row in rows}
+            if not ids.issubset(nodes):
+                raise InvalidMove(_(u'Object does not exist'))
+
+            parents = {}
+            children = {}
+            roots = {}
+            for row in nodes.values():
+                node_id, parent_id, tree_id = row[:3]
+                parents[node_id] = parent_id
+                if parent_id is None:
+                    roots[tree_id] = node_id
+                else:
+                    children.setdefault(parent_id, []).append(node_id)
+            parents_from = {}
+
+            for node_id, target_id, position in operations:
+                if position not in MOVE_POSITIONS:
+                    raise InvalidMove(_(u'Bad request'))
+                if position in ('left', 'right'):
+                    if target_id == node_id:
+                        raise InvalidMove(_(u'A node may not be made a sibling '
+                                            u'of itself.'))
+                    parent_id = parents[target_id]
+                    if parent_id is None:
+                        raise InvalidMove(_(u'Bulk move to root level is not '
+                                            u'supported'))
+                else:
+                    parent_id = target_id
+                ancestor_id = parent_id
+                while ancestor_id is not None:
+                    if ancestor_id == node_id:
+                        raise InvalidMove(_(u'A node may not be made a child '
+                                            u'of itself or its descendants.'))
+                    ancestor_id = parents[ancestor_id]
+
+                parents_from.setdefault(node_id, parents[node_id])
+                if parents[node_id] is None:
+                    del roots[nodes[node_id][2]]
+                else:
+                    children[parents[node_id]].remove(node_id)
+                siblings = children.setdefault(parent_id, [])
+                if position == 'first-child':
+                    siblings.insert(0, node_id)
+                elif position == 'last-child':
+                    siblings.append(node_id)
+                else:
+                    index = siblings.index(target_id)
+                    siblings.insert(index if position == 'left' else index + 1,
+                                    node_id)
+                parents[node_id] = parent_id
+
+            for parent_id in set(parents[node_id] for node_id in parents_from):
+                slugs = set()
+                for child_id in children[parent_id]:
+                    slug = nodes[child_id][6]
+                    if slug is not None and slug in slugs:
+                        raise InvalidMove(_(u'Invalid move. Slug %(slug)s exist '
+                                            u'in this level') % {'slug': slug})
+                    slugs.add(slug)
+
+            changed = []
+            for tree_id, root_id in roots.items():
+                counter = 1
+                root = nodes[root_id]
+                stack = [(root_id, 0, root[7], root[8], False)]
+                lefts = {}
+                while stack:
+                    node_id, level, path, visible, visited = stack.pop()
+                    if not visited:
+                        lefts[node_id] = counter
+                        counter += 1
+                        stack.append((node_id, level, path, visible, True))
+                        for child_id in reversed(children.get(node_id, [])):
+                            child = nodes[child_id]
+                            stack.append((child_id, level + 1,
+                                          join_path(path, child[6]),
+                                          visible and child[8], False))
+                        continue
+                    row = nodes[node_id]
+                    values = (node_id, parents[node_id], tree_id, level,
+                              lefts[node_id], counter, row[6], path, row[8],
+                              visible)
+                    counter += 1
+                    if values != row:
+                        changed.append(TreeItem(
+                            id=node_id, parent_id=values[1], tree_id=tree_id,
+                            level=level, lft=values[4], rght=values[5],
+                            path=path, visible=visible))
+            # rows are updated in arbitrary order, moved nodes are detached
+            # first, so (parent, slug) of siblings is never duplicated
+            # before all rows have their final values
+            reparented = [node_id for node_id in parents_from
+                          if parents[node_id] != nodes[node_id][1]]
+            for i in range(0, len(reparented), DELETE_BATCH_SIZE):
+                manager.filter(pk__in=reparented[i:i + DELETE_BATCH_SIZE]).\
+                    update(parent=None)
+            manager.bulk_update(changed, ['parent', 'tree_id', 'level', 'lft',
+                                          'rght', 'path', 'visible'],
+                                batch_size=500)
+
+        invalidate_catalog(using)
+
+        moved_ids = list(parents_from)
+        related_ids = set(moved_ids)
+        related_ids.update(parents_from.values())
+        related_ids.update(parents[node_id] for node_id in moved_ids)
+        related_ids.discard(None)
+        items = prefetch_content_objects(manager.filter(pk__in=related_ids))
+        objects = {item.id: item.content_object for item in items}
+        moves = []
+        for node_id in moved_ids:
+            if node_id not in objects:
+                continue
+            instance = objects[node_id]
+            parent_from = objects.get(parents_from[node_id])
+            parent_to = objects.get(parents[node_id])
+            moves.append((instance, parent_from, parent_to))
+        if moves:
+            content_objects_bulk_moved.send(sender=TreeItem, moves=moves)
+        return moves
+
+    def get_parent(self):
+        """
+        :return: parent node shared by identity map or None for root node
+        """
+        if not self.parent_id:
+            return None
+        identity_map = get_identity_map()
+        if identity_map is None or TreeItem.parent.is_cached(self):
+            return self.parent
+        parent = identity_map.get_node(self.parent_id)
+        if parent is None:
+            parent = identity_map.add_node(self.parent)
+        else:
+            TreeItem.parent.field.set_cached_value(self, parent)
+        return parent
+
+    def build_path(self, slug):
+        """
+        :return: full path of node built from parent path and `slug`
+        """
+        parent_path = self.get_parent().path if self.parent_id else ''
+        return join_path(parent_path, slug)
+
+    def update_path(self, slug):
+        """
+        Store slug and full path of node and rewrite paths of all descendants
+        :return: True if path has changed
+        """
+        slug = slug or None
+        old_path = self.path
+        new_path = self.build_path(slug)
+        if new_path == old_path and slug == self.slug:
+            return False
+        self.path = new_path
+        self.slug = slug
+        TreeItem.objects.filter(pk=self.pk).update(path=new_path, slug=slug)
+        if new_path == old_path:
+            return False
+        descendants = list(self.get_descendants().only('id', 'path'))
+        for item in descendants:
+            item.path = replace_path_prefix(item.path, old_path, new_path)
+        TreeItem.objects.bulk_update(descendants, ['path'], batch_size=500)
+        return True
+
+    def update_search_text(self, instance):
+        """
+        Store search text of content object `instance` in node
+        """
+        search_text = instance.get_search_text()
+        if search_text != self.search_text:
+            self.search_text = search_text
+            TreeItem.objects.filter(pk=self.pk).update(search_text=search_text)
+
+    def update_visibility(self, show=None):
+        """
+        Store `show` flag of content object in node and recompute visibility
+        of node and its descendants: node is visible when it and all its
+        ancestors are shown
+        :param show: new `show` flag, current stored flag if None
+        :return: True if visibility of node has changed
+        """
+        if show is None:
+            show = self.show
+        parent_visible = self.get_parent().visible if self.parent_id else True
+        visible = show and parent_visible
+        if show == self.show and visible == self.visible:
+            return False
+        visibility_changed = visible != self.visible
+        self.show = show
+        self.visible = visible
+        TreeItem.objects.filter(pk=self.pk).update(show=show, visible=visible)
+        if visibility_changed:
+            descendants = TreeItem.objects.filter(
+                tree_id=self.tree_id, lft__gt=self.lft, rght__lt=self.rght)
+            if not visible:
+                descendants.filter(visible=True).update(visible=False)
+            else:
+                hidden_ancestors = TreeItem.objects.filter(
+                    tree_id=self.tree_id, lft__gt=self.lft,
+                    lft__lte=OuterRef('lft'), rght__gte=OuterRef('rght'),
+                    show=False)
+                shown = descendants.filter(visible=False).annotate(
+                    hidden_ancestor=Exists(hidden_ancestors)).\
+                    filter(hidden_ancestor=False)
+                using = router.db_for_write(TreeItem, instance=self)
+                if connections[using].features.update_can_self_select:
+                    shown.update(visible=True)
+                else:
+                    # MySQL can't select from updated table in subquery
+                    ids = list(shown.values_list('id', flat=True))
+                    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+                        TreeItem.objects.filter(
+                            pk__in=ids[i:i + DELETE_BATCH_SIZE]).\
+                            update(visible=True)
+        return visibility_changed
 
     def get_slug(self):
         """
-        Check contains slug attribute in content_object model
+        Slug of content_object model stored in node
         :return: slug or None
         """
-        try:
-            return self.content_object.slug
-        except AttributeError:
-            return None
+        return self.slug
 
     @classmethod
     def check_slug(self, target, position, slug, node):
@@ -58,16 +597,14 @@ class TreeItem(MPTTModel):
         """
         if target is None:
             siblings = TreeItem.objects.root_nodes()
+        elif position == 'first-child' or position == 'last-child':
+            siblings = TreeItem.objects.filter(parent=target)
         else:
-            if position == 'first-child' or position == 'last-child':
-                siblings = target.get_children()
-            else:
-                siblings = target.get_siblings(include_self=True)
-        for sibling in siblings:
-            if sibling != node and \
-               sibling.get_slug() == slug:
-                return False
-        return True
+            siblings = TreeItem.objects.filter(parent=target.parent_id)
+        siblings = siblings.filter(slug=slug)
+        if node is not None:
+            siblings = siblings.exclude(pk=node.pk)
+        return not siblings.exists()
 
 
 class CatalogBase(models.Model):
@@ -75,6 +612,8 @@ class CatalogBase(models.Model):
         abstract = True
 
     leaf = False
+    # names of fields matched by admin tree search besides name and slug
+    search_fields = ()
     tree = GenericRelation(TreeItem)
     show = models.BooleanField(verbose_name=_('Show on site'), default=True)
     last_modified = models.DateTimeField(verbose_name=_('Datetime last modified'), auto_now=True)
@@ -83,39 +622,74 @@ class CatalogBase(models.Model):
         help_text=_('The slug will be used to create the page URL, it must be unique among the other pages of the same level.')
     )
 
-    FULL_URL_KEY = '%s_%d_url'
+    FULL_URL_KEY = '%s_%d_url_%d'
 
 
-    def cache_url_key(self):
-        return self.FULL_URL_KEY % (self.__class__.__name__, self.id)
+    def get_search_text(self):
+        """
+        :return: lowercase text matched by admin tree search
+        """
+        values = [str(self), self.slug]
+        values.extend(getattr(self, field_name) for field_name in self.search_fields)
+        return ' '.join(str(value) for value in values if value).lower()
 
-    def clear_cache(self):
-        cache.delete(self.cache_url_key())
-        for child in self.tree.get().get_children():
-            child.content_object.clear_cache()
+    def get_tree_item(self):
+        """
+        :return: TreeItem object of content object, cached on instance
+                 and shared by identity map
+        """
+        tree_item = getattr(self, '_tree_item', None)
+        if tree_item is None:
+            identity_map = get_identity_map()
+            if identity_map is not None:
+                content_type_id = ContentType.objects.get_for_model(
+                    self.__class__).id
+                tree_item = identity_map.get_object_node(content_type_id, self.pk)
+            if tree_item is None:
+                tree_item = self.tree.get()
+                if identity_map is not None:
+                    tree_item = identity_map.add_node(tree_item)
+                    identity_map.add_object(content_type_id, self)
+            self._tree_item = tree_item
+        return tree_item
+
+    def cache_url_key(self, version=None):
+        if version is None:
+            version = get_catalog_version()
+        return self.FULL_URL_KEY % (self.__class__.__name__, self.id, version)
+
+    @instrument('clear_cache')
+    def clear_cache(self, structure=True):
+        """
+        Invalidate rendered catalog fragments and, if tree `structure` has
+        changed, cached urls of object and its descendants. Whole catalog
+        cache is invalidated at once by catalog versions
+        """
+        self.__dict__.pop('_complete_slug', None)
+        invalidate_catalog(router.db_for_write(self.__class__, instance=self),
+                           structure)
 
     def full_path(self):
         """
-        Get url path ancestors
+        Get url path stored in tree node
         """
-        path = []
-        for ancestor in self.tree.get().get_ancestors(ascending=True):
-            if ancestor.content_object.slug:
-                path.append(ancestor.content_object.slug)
-        if self.slug:
-            path.append(self.slug)
-        return '/'.join(path)
+        return self.get_tree_item().path
 
+    @instrument('get_complete_slug')
     def get_complete_slug(self):
         """
         :return: full url of object.
         """
+        url = getattr(self, '_complete_slug', None)
+        if url is not None:
+            return url
         key = self.cache_url_key()
         url = cache.get(key, None)
+        record_cache(hits=url is not None, misses=url is None)
         if url is None:
             url = self.full_path()
             if url is not None:
-                cache.set(key, url, None)
+                cache.set(key, url, get_catalog_cache_timeout())
         return url
 
     def get_absolute_url(self):
@@ -1,13 +1,20 @@
 from django.db.models import signals
-from django.core.cache import cache
 from .utils import get_catalog_models
-from .models import TreeItem
+from .models import TreeItem, invalidate_catalog
 from django.dispatch import Signal
 
 # special signals for situations where standard signals not working correctly
 content_object_parent_changed = Signal(providing_args=["instance", "parent_from", "parent_to"])
 content_object_moved = Signal(providing_args=["instance", "parent_from", "parent_to"])
 content_object_created = Signal(providing_args=["instance", "parent"])
+# sent once by `TreeItem.bulk_move`, `moves` is list of
+# (instance, parent_from, parent_to) tuples
+content_objects_bulk_moved = Signal(providing_args=["moves"])
+# sent when catalog cache is invalidated after commit of changes
+catalog_cache_invalidated = Signal(providing_args=["structure"])
+# sent once when node deleted with whole subtree, `objects` maps model class
+# to list of ids of deleted content objects
+subtree_deleted = Signal(providing_args=["instance", "objects"])
 
 
 def insert_in_tree(sender, instance, **kwargs):
@@ -15,24 +22,38 @@ def insert_in_tree(sender, instance, **kwargs):
     Create TreeItem object after content object created
     """
     created = kwargs.pop('created', False)
+    structure = True
     if created:
-        tree_item = TreeItem(parent=None, content_object=instance)
+        show = getattr(instance, 'show', True)
+        tree_item = TreeItem(parent=None, content_object=instance,
+                             slug=instance.slug or None,
+                             search_text=instance.get_search_text(),
+                             show=show, visible=show)
+        tree_item.path = tree_item.build_path(instance.slug)
         tree_item.save()
     else:
         tree_item = instance.tree.get()
-        if tree_item.get_slug() and \
-                        instance.full_path() != cache.get(instance.cache_url_key()):
-            instance.clear_cache()
+        stored = (tree_item.slug, tree_item.path, tree_item.show,
+                  tree_item.visible)
+        tree_item.update_search_text(instance)
+        tree_item.update_path(instance.slug)
+        tree_item.update_visibility(getattr(instance, 'show', True))
+        structure = stored != (tree_item.slug, tree_item.path, tree_item.show,
+                               tree_item.visible)
+    # rendered catalog fragments show content of object, urls and tree
+    # snapshot are kept unless slug or visibility has changed
+    instance.clear_cache(structure)
 
 
 def delete_content_object(sender, instance, **kwargs):
     """
-    Delete children nodes and content object after TreeItem deleted
+    Delete content object after TreeItem deleted by cascade.
+    Children nodes are deleted by the same cascade,
+    `TreeItem.delete` deletes subtree in bulk without this handler
     """
-    for child in instance.get_children():
-        child.delete()
     if instance.content_object:
         instance.content_object.delete()
+    invalidate_catalog(kwargs.get('using'))
 
 for model_cls in get_catalog_models():
     signals.post_save.connect(insert_in_tree, sender=model_cls)
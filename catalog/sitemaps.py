@@ -1,21 +1,116 @@
-from django.contrib.sitemaps import GenericSitemap
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sitemaps import Sitemap
+from django.core.cache import cache
 from django.db.models import FieldDoesNotExist
-from utils import get_catalog_models
+from django.urls import reverse
+from .models import TreeItem, get_catalog_version, get_catalog_cache_timeout
+from .utils import get_catalog_models
 
+SITEMAP_INDEX_KEY = 'catalog_sitemap_%s_%d_%d'
 
-class CatalogSitemap(GenericSitemap):
+
+class CatalogSitemapItems(object):
+    """
+    Lazy list of visible content objects of sitemap model for Paginator.
+    Pages are loaded by ranges of object ids, bounds of pages are found with
+    one pass over tree nodes of model and cached until catalog changes
+    """
+    def __init__(self, sitemap):
+        self.sitemap = sitemap
+        self._index = None
+
+    def get_index(self):
+        """
+        :return: dict with count of visible objects and list of first
+                 object ids of pages
+        """
+        if self._index is not None:
+            return self._index
+        model_cls = self.sitemap.model
+        key = SITEMAP_INDEX_KEY % (model_cls._meta.label_lower,
+                                   self.sitemap.limit, get_catalog_version())
+        index = cache.get(key)
+        if index is None:
+            index = {'count': 0, 'bounds': []}
+            object_ids = TreeItem.objects.filter(
+                content_type=ContentType.objects.get_for_model(model_cls),
+                visible=True).order_by('object_id').\
+                values_list('object_id', flat=True)
+            for object_id in object_ids.iterator():
+                if index['count'] % self.sitemap.limit == 0:
+                    index['bounds'].append(object_id)
+                index['count'] += 1
+            cache.set(key, index, get_catalog_cache_timeout())
+        self._index = index
+        return index
+
+    def count(self):
+        return self.get_index()['count']
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.start is None or \
+                key.start % self.sitemap.limit:
+            raise TypeError('Only slices by sitemap pages are supported')
+        bounds = self.get_index()['bounds']
+        page = key.start // self.sitemap.limit
+        if page >= len(bounds):
+            return []
+        upper = bounds[page + 1] if page + 1 < len(bounds) else None
+        return self.sitemap.get_page_items(bounds[page], upper)
+
+
+class CatalogSitemap(Sitemap):
+    """
+    Sitemap of one catalog model. Only objects of visible tree nodes are
+    included, urls are built from full paths stored in tree nodes
+    """
     def __init__(self, model, priority=None, changefreq=None):
-        info_dict = {
-            'queryset': model.objects.filter(show=True)
-        }
+        self.model = model
+        self.priority = priority
+        self.changefreq = changefreq
         try:
-            model._meta.get_field_by_name('last_modified')
+            model._meta.get_field('last_modified')
         except FieldDoesNotExist:
-            pass
+            self.date_field = None
         else:
-            info_dict['date_field'] = 'last_modified'
-        super(CatalogSitemap, self).__init__(
-            info_dict=info_dict, priority=priority, changefreq=changefreq)
+            self.date_field = 'last_modified'
+
+    def items(self):
+        return CatalogSitemapItems(self)
+
+    def get_page_items(self, lower, upper):
+        """
+        Load visible content objects with ids from `lower` to `upper`
+        (not included) with two range queries
+        :return: list of content objects with stored urls
+        """
+        nodes = TreeItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(self.model),
+            object_id__gte=lower, visible=True)
+        objects = self.model._default_manager.filter(pk__gte=lower)
+        if upper is not None:
+            nodes = nodes.filter(object_id__lt=upper)
+            objects = objects.filter(pk__lt=upper)
+        paths = dict(nodes.order_by().values_list('object_id', 'path'))
+        fields = ['pk', 'slug']
+        if self.date_field:
+            fields.append(self.date_field)
+        items = []
+        for obj in objects.only(*fields).order_by('pk'):
+            if obj.pk in paths:
+                obj._complete_slug = paths[obj.pk]
+                items.append(obj)
+        return items
+
+    def location(self, obj):
+        return obj.get_absolute_url() or reverse('catalog-root')
+
+    def lastmod(self, obj):
+        if self.date_field:
+            return getattr(obj, self.date_field)
 
 
 def get_sitemaps():
@@ -25,11 +120,11 @@ def get_sitemaps():
     sitemaps = {}
     for model in get_catalog_models():
         try:
-            model._meta.get_field_by_name('slug')
+            model._meta.get_field('slug')
         except FieldDoesNotExist:
             pass
         else:
             sitemaps['{0}.{1}'.format(model._meta.app_label,
                                       model._meta.model_name)] = \
                 CatalogSitemap(model)
-    return sitemaps
\ No newline at end of file
+    return sitemaps
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import threading
+from array import array
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from .models import TreeItem, get_catalog_version
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+class TreeSnapshot(object):
+    """
+    Read-only structure of whole catalog tree kept in parallel arrays in
+    tree order. Nodes are addressed by index in arrays, subtree of node
+    is the range of indexes from node index to `end` of node
+    """
+    def __init__(self, version):
+        self.version = version
+        self.ids = array('l')
+        self.parents = array('l')
+        self.content_types = array('l')
+        self.object_ids = array('l')
+        self.tree_ids = array('l')
+        self.lefts = array('l')
+        self.rights = array('l')
+        self.levels = array('l')
+        self.ends = array('l')
+        self.shows = bytearray()
+        self.visibles = bytearray()
+        self.slugs = []
+        self.paths = []
+        self.index_by_id = {}
+        self.index_by_path = {}
+        self.index_by_object = {}
+
+    @classmethod
+    def build(cls, version):
+        """
+        :return: TreeSnapshot object built with one query
+        """
+        snapshot = cls(version)
+        values = TreeItem.objects.order_by('tree_id', 'lft').values_list(
+            'id', 'parent_id', 'content_type_id', 'object_id', 'tree_id',
+            'lft', 'rght', 'level', 'slug', 'path', 'show', 'visible')
+        # indexes of nodes with open subtrees
+        stack = []
+        for index, (node_id, parent_id, content_type_id, object_id, tree_id,
+                    lft, rght, level, slug, path, show,
+                    visible) in enumerate(values.iterator()):
+            while stack and (snapshot.tree_ids[stack[-1]] != tree_id or
+                             snapshot.rights[stack[-1]] < lft):
+                snapshot.ends[stack.pop()] = index
+            snapshot.ids.append(node_id)
+            snapshot.parents.append(snapshot.index_by_id.get(parent_id, -1))
+            snapshot.content_types.append(content_type_id)
+            snapshot.object_ids.append(object_id)
+            snapshot.tree_ids.append(tree_id)
+            snapshot.lefts.append(lft)
+            snapshot.rights.append(rght)
+            snapshot.levels.append(level)
+            snapshot.ends.append(index + 1)
+            snapshot.shows.append(show)
+            snapshot.visibles.append(visible)
+            snapshot.slugs.append(slug)
+            snapshot.paths.append(path)
+            snapshot.index_by_id[node_id] = index
+            snapshot.index_by_path.setdefault(path, index)
+            snapshot.index_by_object[(content_type_id, object_id)] = index
+            stack.append(index)
+        while stack:
+            snapshot.ends[stack.pop()] = len(snapshot.ids)
+        return snapshot
+
+    def find_path(self, path):
+        """
+        :return: index of node with full `path` or None
+        """
+        return self.index_by_path.get(path)
+
+    def find_object(self, instance):
+        """
+        :return: index of node of content object or None
+        """
+        content_type = ContentType.objects.get_for_model(instance.__class__)
+        return self.index_by_object.get((content_type.id, instance.pk))
+
+    def roots(self):
+        """
+        :return: list of indexes of root nodes
+        """
+        return self.children(None)
+
+    def children(self, index):
+        """
+        :return: list of indexes of children of node, root nodes for None
+        """
+        if index is None:
+            child, end = 0, len(self.ids)
+        else:
+            child, end = index + 1, self.ends[index]
+        children = []
+        while child < end:
+            children.append(child)
+            child = self.ends[child]
+        return children
+
+    def descendants(self, index):
+        """
+        :return: indexes of all descendants of node, all nodes for None
+        """
+        if index is None:
+            return range(len(self.ids))
+        return range(index + 1, self.ends[index])
+
+    def ancestors(self, index):
+        """
+        :return: list of indexes of ancestors of node from root
+        """
+        ancestors = []
+        parent = self.parents[index]
+        while parent != -1:
+            ancestors.append(parent)
+            parent = self.parents[parent]
+        ancestors.reverse()
+        return ancestors
+
+    def get_item(self, index):
+        """
+        :return: TreeItem object of node built without query
+        """
+        parent = self.parents[index]
+        item = TreeItem(
+            id=self.ids[index],
+            parent_id=self.ids[parent] if parent != -1 else None,
+            content_type_id=self.content_types[index],
+            object_id=self.object_ids[index], tree_id=self.tree_ids[index],
+            lft=self.lefts[index], rght=self.rights[index],
+            level=self.levels[index], slug=self.slugs[index],
+            path=self.paths[index], show=bool(self.shows[index]),
+            visible=bool(self.visibles[index]))
+        item._state.adding = False
+        return item
+
+    def get_items(self, indexes):
+        """
+        :return: list of TreeItem objects of nodes
+        """
+        return [self.get_item(index) for index in indexes]
+
+
+def get_tree_snapshot():
+    """
+    Get snapshot of catalog tree shared by process. Snapshot is rebuilt
+    when catalog version changes
+    :return: TreeSnapshot object or None if CATALOG_TREE_SNAPSHOT
+             setting is not True
+    """
+    global _snapshot
+    if not getattr(settings, 'CATALOG_TREE_SNAPSHOT', False):
+        return None
+    version = get_catalog_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = TreeSnapshot.build(version)
+                _snapshot = snapshot
+    return snapshot
@@ -271,23 +271,48 @@ CatalogApp.ItemView = Backbone.View.extend({
 CatalogApp.ItemCollection = Backbone.Collection.extend({
 
     model: CatalogApp.ItemModel,
+    per_page: 100,
     initialize: function(options){
         if(options.parent_id){
             this.parent_id = options.parent_id;
         } else {
             this.parent_id = '';
         }
+        this.page = 1;
+        this.sort = '';
+        this.order = 'asc';
         this.fetch({reset: true});
     },
     url: function(){
-        return 'list_children/' + this.parent_id
+        var params = {'page': this.page, 'per_page': this.per_page};
+        if(this.sort){
+            params.sort = this.sort;
+            params.order = this.order;
+        }
+        return 'list_children/' + this.parent_id + '?' + $.param(params);
     },
     parse: function(response, xhr){
         this.fields = response.fields;
+        this.page = response.page || 1;
+        this.num_pages = response.num_pages || 1;
         return response.nodes
     },
     changeParentId: function(parent_id){
         this.parent_id = parent_id;
+        this.page = 1;
+        this.sort = '';
+        this.order = 'asc';
+        this.fetch({reset: true});
+    },
+    changePage: function(page){
+        this.page = page;
+        this.fetch({reset: true});
+    },
+    changeSort: function(sort){
+        // the same column toggles order, other column is sorted ascending
+        this.order = (this.sort === sort && this.order === 'asc') ? 'desc' : 'asc';
+        this.sort = sort;
+        this.page = 1;
         this.fetch({reset: true});
     }
 });
@@ -297,6 +322,11 @@ CatalogApp.ListItemsView = Backbone.View.extend({
     tableEl: '#list_table',
     tbodyEl: '#list_table tbody',
     template: 'table_items_tpl',
+    events: {
+        'click .prev-page': 'prevPage',
+        'click .next-page': 'nextPage',
+        'click th.server-sort': 'sortPages'
+    },
     initialize: function(options){
         var self = this;
         if(options.parent_id){
@@ -317,7 +347,11 @@ CatalogApp.ListItemsView = Backbone.View.extend({
             this.$el.html(
                 templateHelper(
                     this.template,
-                    {fields: this.collection.fields}
+                    {fields: this.collection.fields,
+                     page: this.collection.page,
+                     num_pages: this.collection.num_pages,
+                     sort: this.collection.sort,
+                     order: this.collection.order}
                 )
             );
             this.collection.each(function( item ){
@@ -341,6 +375,22 @@ CatalogApp.ListItemsView = Backbone.View.extend({
         this.collection.changeParentId(options.parent_id);
         return this
     },
+    prevPage: function(event){
+        event.preventDefault();
+        this.destroy();
+        this.collection.changePage(this.collection.page - 1);
+    },
+    nextPage: function(event){
+        event.preventDefault();
+        this.destroy();
+        this.collection.changePage(this.collection.page + 1);
+    },
+    sortPages: function(event){
+        event.preventDefault();
+        var sort = $(event.currentTarget).data('field');
+        this.destroy();
+        this.collection.changeSort(sort);
+    },
     destroy: function() {
         $(this.tableEl).trigger("destroy");
         this.$el.empty();
@@ -358,6 +408,9 @@ CatalogApp.ListItemsView = Backbone.View.extend({
     },
     initSorter: function(){
         self = this;
+        // rows of one page can't be sorted in browser, pages are sorted
+        // by server on header click
+        if(this.collection.num_pages > 1) return;
         $(document).ready(function(){
             $(self.tableEl).tablesorter({
                 theme: 'ice',
@@ -428,6 +481,9 @@ CatalogApp.TreeView = Backbone.View.extend({
                 'animation': 0,
                 'data': {
                     'url': 'tree/',
+                    'data': function(node){
+                        return {'id': node.id};
+                    }
                 }
 
             },
@@ -439,17 +495,27 @@ CatalogApp.TreeView = Backbone.View.extend({
             },
             'search': {
                 'show_only_matches': true,
-                'show_only_matches_children': true
+                'show_only_matches_children': true,
+                'ajax': function(str, callback){
+                    $.getJSON('search/', {'str': str}, function(data){
+                        self.searchMatches = _.map(data.matches, String);
+                        callback(_.map(data.open, String));
+                    });
+                },
+                'search_callback': function(str, node){
+                    return _.contains(self.searchMatches || [], node.id);
+                }
             },
             'contextmenu': {
                 'items': function(node){
                     var tree = self.$el.jstree(true);
                     var submenu = {};
-                    _.each(node.data.add_links, function(link) {
+                    var add_links = CatalogApp.addLinks[node.data.content_type] || [];
+                    _.each(add_links, function(link) {
                         var menu_item = {};
                         menu_item.label = link.label;
                         menu_item.action = function () {
-                            self.addTreeItem(link.url);
+                            self.addTreeItem(link.url + '?target=' + node.id);
                         }
                         submenu[link.label]=menu_item;
                     });
@@ -599,5 +665,6 @@ function dismissAddRelatedObjectPopup(win) {
 }
 
 $(document).ready(function(){
+    CatalogApp.addLinks = JSON.parse($('#catalog-add-links').text());
     var catalogTreeOneView = new CatalogApp.TreeView({});
 });
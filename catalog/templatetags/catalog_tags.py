@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
+import hashlib
 from django import template
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.template.loader import render_to_string
 from classytags.core import Tag, Options
 from classytags.arguments import Argument
-from catalog.models import TreeItem
-from catalog.utils import get_content_objects, get_catalog_models
+from catalog.models import TreeItem, get_fragment_version, \
+    get_catalog_cache_timeout
+from catalog.instrumentation import instrument, record_cache
+from catalog.snapshot import get_tree_snapshot
+from catalog.utils import get_content_objects, get_catalog_models, \
+    prefetch_content_objects, build_tree, get_absolute_urls, CatalogPage
 
 TREE_TYPE_EXPANDED = 'expanded'
 TREE_TYPE_COLLAPSED = 'collapsed'
@@ -13,9 +20,66 @@ TREE_TYPE_DRILLDOWN = 'drilldown'
 DESCENDANTS_TYPE_ALL = 'all'
 DESCENDANTS_TYPE_DIRECT = 'direct'
 
+ORDER_ASC = 'asc'
+ORDER_DESC = 'desc'
+
+FRAGMENT_KEY = 'catalog_fragment_%s_%d'
+BREADCRUMBS_KEY = 'catalog_breadcrumbs_%d_%d'
+
 register = template.Library()
 
 
+class Breadcrumb(object):
+    """
+    Title and url of catalog object in breadcrumbs
+    """
+    def __init__(self, title, url):
+        self.title = title
+        self.url = url
+
+    def get_absolute_url(self):
+        return self.url
+
+    def __str__(self):
+        return self.title
+
+
+def get_fragment_key(*parts):
+    """
+    :param parts: values which rendered fragment depends on
+    :return: cache key of fragment for current fragment version
+    """
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return FRAGMENT_KEY % (digest, get_fragment_version())
+
+
+def get_tree_item(instance, snapshot=None):
+    """
+    :param snapshot: TreeSnapshot object to find node without query
+    :return: TreeItem object of content object
+    """
+    if snapshot is not None and getattr(instance, '_tree_item', None) is None:
+        index = snapshot.find_object(instance)
+        if index is not None:
+            instance._tree_item = snapshot.get_item(index)
+    return instance.get_tree_item()
+
+
+def get_active_ids(catalog_tree_items, instance, snapshot=None):
+    """
+    :param catalog_tree_items: list of TreeItem objects
+    :param instance: current content object
+    :param snapshot: TreeSnapshot object to find node without query
+    :return: set of ids of `instance` node and its ancestors among given nodes
+    """
+    if not hasattr(instance, 'get_tree_item'):
+        return set()
+    active = get_tree_item(instance, snapshot)
+    return {item.id for item in catalog_tree_items
+            if item.tree_id == active.tree_id and
+            item.lft <= active.lft and item.rght >= active.rght}
+
+
 class CatalogChildren(Tag):
     """
     Render or get chlidren for given object.
@@ -27,8 +91,18 @@ class CatalogChildren(Tag):
             Model name
         descendants
             get children or all descendants
+        limit
+            Number of objects in page. With limit result is CatalogPage
+            object loading only objects of page
+        after
+            Cursor of page, `next_cursor` of previous page
+        order
+            `asc` for tree order, `desc` for reverse tree order
         as
             Name of context variable with result.
+        cache
+            Cache rendered html for given number of seconds until
+            catalog changes
     """
     name = 'catalog_children'
     template = 'catalog/children_tag.html'
@@ -41,16 +115,85 @@ class CatalogChildren(Tag):
         'descendants',
         Argument('descendants', required=False,
                  default=DESCENDANTS_TYPE_DIRECT, resolve=False),
+        'limit',
+        Argument('limit', required=False),
+        'after',
+        Argument('after', required=False),
+        'order',
+        Argument('order', required=False, default=ORDER_ASC, resolve=False),
         'as',
-        Argument('varname', required=False, resolve=False)
+        Argument('varname', required=False, resolve=False),
+        'cache',
+        Argument('cache_timeout', required=False),
     )
 
-    def render_tag(self, context, instance, model_type, descendants, varname):
+    def render_tag(self, context, instance, model_type, descendants, limit,
+                   after, order, varname, cache_timeout):
+        if cache_timeout is not None and not varname:
+            key = get_fragment_key(
+                'children', instance._meta.label_lower if instance else None,
+                instance.pk if instance else None, model_type, descendants,
+                limit, after, order, self.template)
+            html = cache.get(key)
+            record_cache(hits=html is not None, misses=html is None)
+            if html is None:
+                html = self.render_children(context, instance, model_type,
+                                            descendants, limit, after, order,
+                                            varname)
+                cache.set(key, html, int(cache_timeout))
+            return html
+        return self.render_children(context, instance, model_type,
+                                    descendants, limit, after, order, varname)
+
+    def get_page(self, instance, model_type, descendants, limit, after, order):
+        """
+        :return: CatalogPage object with children of `instance`
+        """
+        snapshot = get_tree_snapshot()
         if instance:
+            treeitem = get_tree_item(instance, snapshot)
+            if descendants == DESCENDANTS_TYPE_ALL:
+                nodes = TreeItem.objects.filter(
+                    tree_id=treeitem.tree_id, lft__gt=treeitem.lft,
+                    rght__lt=treeitem.rght)
+            else:
+                nodes = TreeItem.objects.filter(parent=treeitem.id)
+        else:
+            nodes = TreeItem.objects.filter(parent=None)
+        if model_type:
+            nodes = nodes.filter(content_type__in=[
+                ContentType.objects.get_for_model(model_cls)
+                for model_cls in get_catalog_models()
+                if model_cls._meta.model_name == model_type])
+        return CatalogPage(nodes, limit, after, descending=order == ORDER_DESC)
+
+    def render_children(self, context, instance, model_type, descendants,
+                        limit, after, order, varname):
+        if limit:
+            queryset = self.get_page(instance, model_type, descendants, limit,
+                                     after, order)
+            if varname:
+                context[varname] = queryset
+                return u''
+            get_absolute_urls(queryset.object_list)
+            context['children'] = queryset
+            return render_to_string(self.template, context.flatten())
+
+        snapshot = get_tree_snapshot()
+        index = snapshot.find_object(instance) \
+            if snapshot is not None and instance else None
+        if instance and index is not None:
+            if descendants == DESCENDANTS_TYPE_ALL:
+                children = snapshot.get_items(snapshot.descendants(index))
+            else:
+                children = snapshot.get_items(snapshot.children(index))
+        elif instance:
             if descendants == DESCENDANTS_TYPE_ALL:
-                children = instance.tree.get().get_descendants()
+                children = instance.get_tree_item().get_descendants()
             elif descendants == DESCENDANTS_TYPE_DIRECT:
-                children = instance.tree.get().get_children()
+                children = instance.get_tree_item().get_children()
+        elif snapshot is not None:
+            children = snapshot.get_items(snapshot.roots())
         else:
             children = TreeItem.objects.root_nodes()
 
@@ -59,11 +202,17 @@ class CatalogChildren(Tag):
             for model_cls in get_catalog_models():
                 if model_cls._meta.model_name == model_type:
                     ModelClass = model_cls
-            if ModelClass is not None:
+            if ModelClass is not None and isinstance(children, list):
+                content_type = ContentType.objects.get_for_model(ModelClass)
+                allowed_ids = [item.object_id for item in children
+                               if item.visible and
+                               item.content_type_id == content_type.id]
+            elif ModelClass is not None:
                 allowed_ids = children.filter(
-                    content_type__model=model_type).values_list('object_id',
-                                                                flat=True)
-                queryset = ModelClass.objects.filter(id__in=allowed_ids, show=True).order_by('tree__tree_id', 'tree__lft')
+                    content_type__model=model_type, visible=True).\
+                    values_list('object_id', flat=True)
+            if ModelClass is not None:
+                queryset = ModelClass.objects.filter(id__in=allowed_ids).order_by('tree__tree_id', 'tree__lft')
             else:
                 queryset = []
         else:
@@ -72,8 +221,10 @@ class CatalogChildren(Tag):
             context[varname] = queryset
             return u''
         else:
+            queryset = list(queryset)
+            get_absolute_urls(queryset)
             context['children'] = queryset
-            return render_to_string(self.template, context)
+            return render_to_string(self.template, context.flatten())
 
 register.tag(CatalogChildren)
 
@@ -92,6 +243,10 @@ class CatalogTreeRender(Tag):
             `expanded` - all menu nodes will be expanded
         template
             Name template for render tree
+        cache
+            Cache nodes of tree and rendered html for given number of
+            seconds until catalog changes. Html is cached for every active
+            path, nodes are shared by all paths
     """
     name = 'render_catalog_tree'
     template = 'catalog/tree.html'
@@ -102,23 +257,80 @@ class CatalogTreeRender(Tag):
         Argument('tree_type', required=False, resolve=True,
                  default=TREE_TYPE_DRILLDOWN),
         'template',
-        Argument('template', required=False)
+        Argument('template', required=False),
+        'cache',
+        Argument('cache_timeout', required=False),
     )
 
-    def render_tag(self, context, treeitem, tree_type, template):
+    def get_items(self, treeitem, tree_type, snapshot=None):
+        """
+        :param snapshot: TreeSnapshot object to get nodes without query
+        :return: list of TreeItem objects of rendered tree in tree order
+        """
+        index = snapshot.index_by_id.get(treeitem.id) \
+            if snapshot is not None and treeitem else None
+        if snapshot is not None and (index is not None or not treeitem):
+            indexes = snapshot.descendants(index)
+            if tree_type == TREE_TYPE_COLLAPSED:
+                level = self.get_level(treeitem)
+                indexes = [i for i in indexes if snapshot.levels[i] == level]
+            return snapshot.get_items(indexes)
         if treeitem:
-            tree_list = list(treeitem.get_children())
+            items = treeitem.get_descendants()
         else:
-            tree_list = list(TreeItem.objects.root_nodes())
+            items = TreeItem.objects.all()
+        if tree_type == TREE_TYPE_COLLAPSED:
+            items = items.filter(level=self.get_level(treeitem))
+        return list(items)
 
-        context['tree_list'] = get_content_objects(tree_list)
-        context['type'] = tree_type
+    def get_level(self, treeitem):
+        """
+        :return: level of top nodes of rendered tree
+        """
+        return treeitem.level + 1 if treeitem else 0
 
-        if template:
-            output = render_to_string(template, context)
+    @instrument('render_catalog_tree')
+    def render_tag(self, context, treeitem, tree_type, template, cache_timeout):
+        template = template or self.template
+        level = self.get_level(treeitem)
+        snapshot = get_tree_snapshot()
+        if cache_timeout is None:
+            items = self.get_items(treeitem, tree_type, snapshot)
+            active_ids = get_active_ids(items, context.get('object'), snapshot)
+            if tree_type == TREE_TYPE_DRILLDOWN:
+                items = [item for item in items
+                         if item.level == level or item.parent_id in active_ids]
+            items = prefetch_content_objects(items, show=True)
+            get_absolute_urls([item.content_object for item in items])
         else:
-            output = render_to_string(self.template, context)
-        return output
+            parts = ('tree', treeitem.id if treeitem else None, tree_type)
+            key = get_fragment_key(*parts)
+            all_items = cache.get(key)
+            record_cache(hits=all_items is not None, misses=all_items is None)
+            if all_items is None:
+                all_items = prefetch_content_objects(
+                    self.get_items(treeitem, tree_type, snapshot), show=True)
+                get_absolute_urls([item.content_object for item in all_items])
+                cache.set(key, all_items, int(cache_timeout))
+            active_ids = get_active_ids(all_items, context.get('object'),
+                                        snapshot)
+            html_key = get_fragment_key(template, sorted(active_ids), *parts)
+            html = cache.get(html_key)
+            record_cache(hits=html is not None, misses=html is None)
+            if html is not None:
+                return html
+            items = all_items
+            if tree_type == TREE_TYPE_DRILLDOWN:
+                items = [item for item in items
+                         if item.level == level or item.parent_id in active_ids]
+
+        context['tree_list'] = build_tree(items, treeitem, active_ids)
+        context['type'] = tree_type
+        context['tree_template'] = template
+        html = render_to_string(template, context.flatten())
+        if cache_timeout is not None:
+            cache.set(html_key, html, int(cache_timeout))
+        return html
 
 register.tag(CatalogTreeRender)
 
@@ -126,9 +338,26 @@ register.tag(CatalogTreeRender)
 @register.inclusion_tag('catalog/breadcrumbs.html', takes_context=True)
 def catalog_breadcrumbs(context, instance):
     """
-    Get breadcrumbs for catalog object
+    Get breadcrumbs for catalog object. Ancestors are loaded with one query
+    and one query per model, their titles and urls are cached until
+    catalog changes
     """
-    treeitem = instance.tree.get()
-    context.update({'breadcrumbs':
-                        get_content_objects(treeitem.get_ancestors())})
+    snapshot = get_tree_snapshot()
+    treeitem = get_tree_item(instance, snapshot)
+    key = BREADCRUMBS_KEY % (treeitem.id, get_fragment_version())
+    breadcrumbs = cache.get(key)
+    record_cache(hits=breadcrumbs is not None, misses=breadcrumbs is None)
+    if breadcrumbs is None:
+        index = snapshot.index_by_id.get(treeitem.id) \
+            if snapshot is not None else None
+        if index is not None:
+            ancestors = snapshot.get_items(snapshot.ancestors(index))
+        else:
+            ancestors = treeitem.get_ancestors()
+        objects = get_content_objects(ancestors)
+        breadcrumbs = [(str(obj), url) for obj, url
+                       in zip(objects, get_absolute_urls(objects))]
+        cache.set(key, breadcrumbs, get_catalog_cache_timeout())
+    context.update({'breadcrumbs': [Breadcrumb(title, url)
+                                    for title, url in breadcrumbs]})
     return context
\ No newline at end of file
@@ -1,8 +1,101 @@
+import hashlib
+from itertools import islice
 from django.apps import apps as django_apps
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q
-from .models import TreeItem
+from django.db.models import Q, QuerySet
+from django.core.cache import cache
+from .models import TreeItem, CatalogBase, get_catalog_version, \
+    get_catalog_cache_timeout, join_path
+from .identity import get_identity_map
+from .instrumentation import instrument, record_cache
+from .snapshot import get_tree_snapshot
+
+MISSING_PATH_KEY = 'catalog_missing_path_%s_%d'
+MISSING_PATH_TIMEOUT = 60 * 60
+
+
+class CatalogPage(object):
+    """
+    Page of content objects of tree nodes in tree order. Nodes of page are
+    found with one keyset query by (tree_id, lft) and their content objects
+    are loaded on first access with one query per model
+    """
+    def __init__(self, nodes, limit, after=None, descending=False):
+        """
+        :param nodes: QuerySet of TreeItem objects
+        :param limit: number of nodes in page
+        :param after: cursor of the last node of previous page
+        :param descending: reverse tree order
+        """
+        self.nodes = nodes
+        self.limit = int(limit)
+        self.after = self.parse_cursor(after)
+        self.descending = descending
+        self._objects = None
+        self._has_next = False
+        self._next_cursor = None
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """
+        :return: tuple (tree_id, lft) or None for empty or invalid cursor
+        """
+        try:
+            tree_id, lft = str(cursor).split('-')
+            return int(tree_id), int(lft)
+        except ValueError:
+            return None
+
+    def load(self):
+        if self._objects is not None:
+            return
+        nodes = self.nodes.filter(visible=True)
+        if self.after is not None:
+            tree_id, lft = self.after
+            if self.descending:
+                nodes = nodes.filter(Q(tree_id__lt=tree_id) |
+                                     Q(tree_id=tree_id, lft__lt=lft))
+            else:
+                nodes = nodes.filter(Q(tree_id__gt=tree_id) |
+                                     Q(tree_id=tree_id, lft__gt=lft))
+        if self.descending:
+            nodes = nodes.order_by('-tree_id', '-lft')
+        else:
+            nodes = nodes.order_by('tree_id', 'lft')
+        items = list(nodes[:self.limit + 1])
+        self._has_next = len(items) > self.limit
+        items = items[:self.limit]
+        if self._has_next:
+            self._next_cursor = '{}-{}'.format(items[-1].tree_id, items[-1].lft)
+        self._objects = get_content_objects(items)
+
+    @property
+    def object_list(self):
+        self.load()
+        return self._objects
+
+    @property
+    def has_next(self):
+        self.load()
+        return self._has_next
+
+    @property
+    def next_cursor(self):
+        """
+        :return: cursor for `after` argument of next page or None
+        """
+        self.load()
+        return self._next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
 
 
 def get_catalog_models():
@@ -14,35 +107,137 @@ def get_catalog_models():
         yield django_apps.get_model(app_label, model_name)
 
 
-def get_content_objects(catalog_tree_items, show=True, allowed_models=[]):
+def prefetch_content_objects(catalog_tree_items, show=False, allowed_models=()):
     """
+    Load content objects of tree items with one query per model and attach
+    them to items
     :param catalog_tree_items: QuerySet or list of TreeItem objects
-    :return: list of content objects
+    :param show: load only content objects of visible nodes: nodes shown
+                 on site with all their ancestors
+    :param allowed_models: load only content objects of this models
+    :return: list of TreeItem objects with loaded content objects
     """
-    res = []
+    if isinstance(allowed_models, list):
+        allowed_models = tuple(allowed_models)
+    if allowed_models and isinstance(catalog_tree_items, QuerySet):
+        content_types = ContentType.objects.get_for_models(
+            *[model_cls for model_cls in get_catalog_models()
+              if issubclass(model_cls, allowed_models)])
+        catalog_tree_items = catalog_tree_items.filter(
+            content_type__in=content_types.values())
+    if show and isinstance(catalog_tree_items, QuerySet):
+        catalog_tree_items = catalog_tree_items.filter(visible=True)
+    items = list(catalog_tree_items)
     if show:
-        for item in catalog_tree_items:
-            if hasattr(item.content_object, 'show') and item.content_object.show:
-                if allowed_models:
-                    if isinstance(item.content_object, allowed_models):
-                        res.append(item.content_object)
+        items = [item for item in items if item.visible]
+
+    object_ids = {}
+    for item in items:
+        object_ids.setdefault(item.content_type_id, []).append(item.object_id)
+    identity_map = get_identity_map()
+    objects = {}
+    for content_type_id, ids in object_ids.items():
+        model_cls = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model_cls is None or \
+                (allowed_models and not issubclass(model_cls, allowed_models)):
+            continue
+        if identity_map is not None:
+            missed_ids = []
+            for object_id in ids:
+                obj = identity_map.get_object(content_type_id, object_id)
+                if obj is None:
+                    missed_ids.append(object_id)
                 else:
-                    res.append(item.content_object)
-    else:
-        for item in catalog_tree_items:
-            if allowed_models:
-                if isinstance(item.content_object, allowed_models):
-                    res.append(item.content_object)
-            else:
-                res.append(item.content_object)
+                    objects[(content_type_id, object_id)] = obj
+            ids = missed_ids
+            if not ids:
+                continue
+        queryset = model_cls._default_manager.all()
+        for object_id, obj in queryset.in_bulk(ids).items():
+            if identity_map is not None:
+                obj = identity_map.add_object(content_type_id, obj)
+            objects[(content_type_id, object_id)] = obj
+
+    res = []
+    for item in items:
+        obj = objects.get((item.content_type_id, item.object_id))
+        if obj is not None:
+            if identity_map is not None:
+                item = identity_map.add_node(item)
+            item.content_object = obj
+            obj._tree_item = item
+            res.append(item)
     return res
 
 
+@instrument('get_content_objects')
+def get_content_objects(catalog_tree_items, show=True, allowed_models=[]):
+    """
+    :param catalog_tree_items: QuerySet or list of TreeItem objects
+    :return: list of content objects
+    """
+    items = prefetch_content_objects(catalog_tree_items, show=show,
+                                     allowed_models=allowed_models)
+    return [item.content_object for item in items]
+
+
+class TreeNode(object):
+    """
+    Content object in tree built by `build_tree`. Attributes of content
+    object are available on node, `active` and `children` belong to node,
+    so content objects shared by identity map are not changed
+    """
+    def __init__(self, obj, active=False):
+        self.object = obj
+        self.active = active
+        self.children = []
+
+    def __getattr__(self, name):
+        return getattr(self.object, name)
+
+    def __str__(self):
+        return str(self.object)
+
+
+def build_tree(catalog_tree_items, parent=None, active_ids=()):
+    """
+    Build nested structure of tree nodes in memory
+    :param catalog_tree_items: list of TreeItem objects in tree order with
+        loaded content objects
+    :param parent: TreeItem object above the top level, None for root nodes
+    :param active_ids: ids of TreeItem objects to mark as active
+    :return: list of TreeNode objects of top level wrapping content objects,
+        with `children` (list of TreeNode objects of child nodes) and
+        `active` attributes. Nodes without loaded parent node or content
+        object are skipped with their descendants
+    """
+    parent_id = parent.id if parent else None
+    nodes = {}
+    tree = []
+    for item in catalog_tree_items:
+        if item.content_object is None:
+            continue
+        node = TreeNode(item.content_object, item.id in active_ids)
+        if item.parent_id == parent_id:
+            tree.append(node)
+        elif item.parent_id in nodes:
+            nodes[item.parent_id].children.append(node)
+        else:
+            continue
+        nodes[item.id] = node
+    return tree
+
+
 def get_sorted_content_objects(content_objects):
     """
     :param content_objects: QuerySet or list of content objects
     :return: list of content objects sorted in tree order
     """
+    content_objects = list(content_objects)
+    if all(hasattr(instance, '_tree_item') for instance in content_objects):
+        return sorted(content_objects,
+                      key=lambda instance: (instance._tree_item.tree_id,
+                                            instance._tree_item.lft))
     objects = {}
     for instance in content_objects:
         content_type = ContentType.objects.get_for_model(instance.__class__)
@@ -54,4 +249,148 @@ def get_sorted_content_objects(content_objects):
         q |= Q(content_type=content_type, object_id=object_id)
     items = TreeItem.objects.filter(q)
     values = items.values_list('content_type', 'object_id')
-    return [objects[value] for value in values]
\ No newline at end of file
+    return [objects[value] for value in values]
+
+
+def get_absolute_urls(content_objects):
+    """
+    Get urls of content objects with one cache round-trip.
+    Missed urls are taken from tree nodes with one query and cached.
+    Urls are also stored on objects, so `get_absolute_url` of them
+    does not touch cache
+    :param content_objects: QuerySet or list of content objects
+    :return: list of urls
+    """
+    content_objects = list(content_objects)
+    version = get_catalog_version()
+    keys = {}
+    for instance in content_objects:
+        if getattr(instance, '_complete_slug', None) is None:
+            keys[instance.cache_url_key(version)] = instance
+    if keys:
+        cached = cache.get_many(list(keys))
+        record_cache(hits=len(cached), misses=len(keys) - len(cached))
+        missed = {}
+        for key, instance in keys.items():
+            if key in cached:
+                instance._complete_slug = cached[key]
+            elif hasattr(instance, '_tree_item'):
+                instance._complete_slug = instance._tree_item.path
+            else:
+                content_type = ContentType.objects.get_for_model(instance.__class__)
+                missed.setdefault(content_type.id, {})[instance.id] = instance
+        if missed:
+            q = Q()
+            for content_type_id, objects in missed.items():
+                q |= Q(content_type=content_type_id, object_id__in=list(objects))
+            values = TreeItem.objects.filter(q).values_list(
+                'content_type', 'object_id', 'path')
+            for content_type_id, object_id, path in values:
+                missed[content_type_id][object_id]._complete_slug = path
+        cache.set_many({key: instance._complete_slug
+                        for key, instance in keys.items()
+                        if key not in cached and
+                        getattr(instance, '_complete_slug', None) is not None},
+                       get_catalog_cache_timeout())
+    return [instance.get_absolute_url() for instance in content_objects]
+
+
+def rebuild_tree_fields(chunk_size=500):
+    """
+    Recompute slug, full path, search text and visibility of all tree nodes
+    from their content objects. Nodes are read in tree order by chunks,
+    paths and visibility of parents are kept in a stack
+    :return: number of updated nodes
+    """
+    fields = ['slug', 'path', 'search_text', 'show', 'visible']
+    updated = 0
+    stack = []
+    nodes = TreeItem.objects.all().iterator(chunk_size=chunk_size)
+    chunk = list(islice(nodes, chunk_size))
+    while chunk:
+        objects = {item.id: item.content_object
+                   for item in prefetch_content_objects(chunk)}
+        changed = []
+        for item in chunk:
+            while stack and (stack[-1][0] != item.tree_id or
+                             stack[-1][1] < item.lft):
+                stack.pop()
+            instance = objects.get(item.id)
+            values = [None, '', '', True, True]
+            if instance is not None:
+                values[0] = getattr(instance, 'slug', None) or None
+                values[2] = instance.get_search_text()
+                values[3] = getattr(instance, 'show', True)
+            values[1] = join_path(stack[-1][2] if stack else '', values[0])
+            values[4] = values[3] and (stack[-1][3] if stack else True)
+            if values != [getattr(item, field) for field in fields]:
+                for field, value in zip(fields, values):
+                    setattr(item, field, value)
+                changed.append(item)
+            stack.append((item.tree_id, item.rght, item.path, item.visible))
+        TreeItem.objects.bulk_update(changed, fields, batch_size=chunk_size)
+        updated += len(changed)
+        chunk = list(islice(nodes, chunk_size))
+    return updated
+
+
+def warm_url_cache(batch_size=500, tree_ids=None):
+    """
+    Cache urls of content objects of all tree nodes in tree order.
+    Urls are taken from full paths stored in nodes and written to cache
+    by batches with `set_many`
+    :param batch_size: number of urls written at once
+    :param tree_ids: warm only trees with given ids
+    :return: number of cached urls
+    """
+    version = get_catalog_version()
+    timeout = get_catalog_cache_timeout()
+    nodes = TreeItem.objects.all()
+    if tree_ids is not None:
+        nodes = nodes.filter(tree_id__in=tree_ids)
+    values = nodes.values_list('content_type', 'object_id', 'path').\
+        iterator(chunk_size=batch_size)
+    class_names = {}
+    count = 0
+    batch = {}
+    for content_type_id, object_id, path in values:
+        if content_type_id not in class_names:
+            model_cls = ContentType.objects.get_for_id(content_type_id).model_class()
+            class_names[content_type_id] = model_cls.__name__ if model_cls else None
+        if class_names[content_type_id] is None:
+            continue
+        key = CatalogBase.FULL_URL_KEY % (class_names[content_type_id],
+                                          object_id, version)
+        batch[key] = path
+        if len(batch) >= batch_size:
+            cache.set_many(batch, timeout)
+            count += len(batch)
+            batch = {}
+    if batch:
+        cache.set_many(batch, timeout)
+        count += len(batch)
+    return count
+
+
+def resolve_path(path):
+    """
+    Find tree node by full url path with one indexed query or without
+    query when tree snapshot is enabled. Unknown paths are cached until
+    catalog changes
+    :param path: full path of node without leading and trailing slashes
+    :return: TreeItem object or None
+    """
+    snapshot = get_tree_snapshot()
+    if snapshot is not None:
+        index = snapshot.find_path(path)
+        return snapshot.get_item(index) if index is not None else None
+    key = MISSING_PATH_KEY % (hashlib.md5(path.encode('utf-8')).hexdigest(),
+                              get_catalog_version())
+    if cache.get(key):
+        record_cache(hits=1)
+        return None
+    treeitem = TreeItem.objects.filter(path=path).first()
+    if treeitem is None:
+        record_cache(misses=1)
+        cache.set(key, True, MISSING_PATH_TIMEOUT)
+    return treeitem
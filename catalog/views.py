@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 from django.views.generic import DetailView, TemplateView
 from django.http import Http404
-from django.core.exceptions import ObjectDoesNotExist, FieldError, ImproperlyConfigured
+from django.core.exceptions import ImproperlyConfigured
 from .models import TreeItem
-from .utils import get_catalog_models, get_content_objects, get_sorted_content_objects
+from .instrumentation import instrument
+from .snapshot import get_tree_snapshot
+from .utils import get_content_objects, get_sorted_content_objects, \
+    get_absolute_urls, resolve_path
 
 
 class CatalogRootView(TemplateView):
@@ -15,9 +18,20 @@ class CatalogRootView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super(CatalogRootView, self).get_context_data(**kwargs)
         # get single root object defining from custom model as CatalogRoot
-        root = TreeItem.objects.root_nodes().first()
+        snapshot = get_tree_snapshot()
+        if snapshot is not None:
+            roots = snapshot.roots()
+            root = snapshot.get_item(roots[0]) if roots else None
+            children = snapshot.get_items(snapshot.children(roots[0])) \
+                if roots else []
+        else:
+            root = TreeItem.objects.root_nodes().first()
+            children = root.get_children() if root else []
         root_page = root.content_object if root else None
-        object_list = get_sorted_content_objects(get_content_objects(root.get_children())) if root else TreeItem.objects.none()
+        if root_page is not None:
+            root_page._tree_item = root
+        object_list = get_sorted_content_objects(get_content_objects(children)) if root else TreeItem.objects.none()
+        get_absolute_urls(object_list)
         context.update({
             'object': root_page,
             'object_list': object_list
@@ -37,27 +51,17 @@ class CatalogItemView(DetailView):
         names.append("catalog/{}.html".format(self.object._meta.model_name))
         return names
 
+    @instrument('CatalogItemView.get_object')
     def get_object(self, queryset=None):
         path = self.kwargs.get('path', None)
         if path.endswith('/'):
             path = path[:-1]
-        slug = path.split('/')[-1]
-        catalog_items = []
-
-        for model_cls in get_catalog_models():
-            try:
-                item = model_cls.objects.get(slug=slug)
-            except (ObjectDoesNotExist, FieldError):
-                pass
-            else:
-                catalog_items.append(item)
-
-        for item in catalog_items:
-            try:
-                complete_slug = item.get_complete_slug()
-            except ObjectDoesNotExist:
-                raise Http404
-            if complete_slug == path:
-                return item
-
-        raise Http404
\ No newline at end of file
+        treeitem = resolve_path(path)
+        if treeitem is None or treeitem.content_object is None:
+            raise Http404
+        # staff users can preview hidden pages from admin
+        user = getattr(self.request, 'user', None)
+        if not treeitem.visible and not (user and user.is_staff):
+            raise Http404
+        treeitem.content_object._tree_item = treeitem
+        return treeitem.content_object
\ No newline at end of file
@@ -24,7 +24,7 @@ setup(
         'Programming Language :: Python',
         'Topic :: Internet :: WWW/HTTP :: Dynamic Content :: News/Diary',
     ],
-    packages=find_packages(),
+    packages=find_packages(exclude=['tests']),
     install_requires=[
         'django-classy-tags==0.9.0',
         'django-mptt==0.9.*',
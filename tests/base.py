@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import cache
+from catalog.models import TreeItem
+from catalog.utils import rebuild_tree_fields
+from .models import Section, Product
+
+
+class CatalogTestMixin(object):
+    """
+    Helpers to create catalog tree and check it against rebuilt one
+    """
+
+    def setUp(self):
+        super(CatalogTestMixin, self).setUp()
+        cache.clear()
+
+    def make(self, model_cls, slug, parent=None, **kwargs):
+        """
+        :return: content object created as last child of `parent`
+        """
+        kwargs.setdefault('title', slug.upper())
+        instance = model_cls.objects.create(slug=slug, **kwargs)
+        if parent is not None:
+            instance.tree.get().move_to(parent.tree.get(), 'last-child')
+        return instance
+
+    def make_tree(self):
+        """
+        Create tree: root / a / b / p0..p2, root / c / p3, root / d
+        """
+        self.root = self.make(Section, '')
+        self.a = self.make(Section, 'a', self.root)
+        self.b = self.make(Section, 'b', self.a)
+        self.products = [self.make(Product, 'p{}'.format(i), self.b)
+                         for i in range(3)]
+        self.c = self.make(Section, 'c', self.root)
+        self.products.append(self.make(Product, 'p3', self.c))
+        self.d = self.make(Section, 'd', self.root)
+
+    def get_tree_state(self):
+        """
+        :return: list of tree fields and stored paths of all nodes
+        """
+        return list(TreeItem.objects.order_by('id').values_list(
+            'id', 'parent_id', 'lft', 'rght', 'level', 'slug', 'path',
+            'visible'))
+
+    def assertTreeConsistent(self):
+        """
+        Tree fields, slugs and paths must not change after full rebuild
+        """
+        state = self.get_tree_state()
+        TreeItem.objects.rebuild()
+        rebuild_tree_fields()
+        self.assertEqual(state, self.get_tree_state())
+
+    def get_children_slugs(self, instance):
+        return [item.slug for item in instance.tree.get().get_children()]
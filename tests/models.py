@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from django.db import models
+from catalog.models import CatalogBase, TreeItem
+
+
+class Section(CatalogBase):
+    title = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.title
+
+
+class Product(CatalogBase):
+    leaf = True
+    title = models.CharField(max_length=100)
+    price = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.title
+
+
+class Note(models.Model):
+    """
+    Model referring to tree nodes, subtrees are deleted by Django collector
+    """
+    node = models.ForeignKey(TreeItem, on_delete=models.CASCADE)
+    text = models.CharField(max_length=100)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from django.db import transaction
+from django.test import TransactionTestCase
+from catalog.models import get_catalog_version, get_fragment_version
+from catalog.signals import catalog_cache_invalidated
+from .base import CatalogTestMixin
+from .models import Section, Product
+
+
+class CacheVersionTest(CatalogTestMixin, TransactionTestCase):
+    """
+    Cache is invalidated after commit, so changes are committed
+    """
+
+    def setUp(self):
+        super(CacheVersionTest, self).setUp()
+        self.make_tree()
+        self.invalidations = []
+        catalog_cache_invalidated.connect(self.on_invalidated)
+
+    def tearDown(self):
+        catalog_cache_invalidated.disconnect(self.on_invalidated)
+        super(CacheVersionTest, self).tearDown()
+
+    def on_invalidated(self, structure, **kwargs):
+        self.invalidations.append(structure)
+
+    def check(self, structure, func):
+        """
+        Fragment version must change on every change, tree version only on
+        changes of `structure`
+        """
+        catalog_version = get_catalog_version()
+        fragment_version = get_fragment_version()
+        func()
+        self.assertNotEqual(get_fragment_version(), fragment_version)
+        if structure:
+            self.assertNotEqual(get_catalog_version(), catalog_version)
+        else:
+            self.assertEqual(get_catalog_version(), catalog_version)
+        self.assertEqual(self.invalidations, [structure])
+
+    def test_content_change(self):
+        def change():
+            self.products[0].title = 'Changed'
+            self.products[0].price = 100
+            self.products[0].save()
+        self.check(False, change)
+
+    def test_slug_change(self):
+        def change():
+            self.b.slug = 'changed'
+            self.b.save()
+        self.check(True, change)
+        self.assertEqual(Product.objects.get(slug='p0').get_absolute_url(),
+                         '/catalog/a/changed/p0/')
+
+    def test_show_change(self):
+        def change():
+            self.a.show = False
+            self.a.save()
+        self.check(True, change)
+
+    def test_move(self):
+        def change():
+            self.products[0].tree.get().move_to(self.c.tree.get(),
+                                                'last-child')
+        self.check(True, change)
+
+    def test_reorder(self):
+        def change():
+            self.products[2].tree.get().move_to(self.b.tree.get(),
+                                                'first-child')
+        self.check(True, change)
+
+    def test_create(self):
+        def change():
+            with transaction.atomic():
+                self.make(Product, 'p4', self.d)
+        self.check(True, change)
+
+    def test_transaction_invalidates_once(self):
+        def change():
+            with transaction.atomic():
+                for product in self.products:
+                    product.title = product.title + '!'
+                    product.save()
+                self.d.slug = 'changed'
+                self.d.save()
+        self.check(True, change)
+
+    def test_rollback(self):
+        catalog_version = get_catalog_version()
+        fragment_version = get_fragment_version()
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                self.a.slug = 'changed'
+                self.a.save()
+                raise ValueError
+        self.assertEqual(get_catalog_version(), catalog_version)
+        self.assertEqual(get_fragment_version(), fragment_version)
+        self.assertEqual(self.invalidations, [])
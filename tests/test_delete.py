@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from unittest import mock
+from django.test import TestCase
+from catalog.models import TreeItem
+from catalog.signals import subtree_deleted
+from .base import CatalogTestMixin
+from .models import Section, Product, Note
+
+
+class DeleteTest(CatalogTestMixin, TestCase):
+
+    def setUp(self):
+        super(DeleteTest, self).setUp()
+        self.make_tree()
+        self.deleted = []
+        subtree_deleted.connect(self.on_subtree_deleted)
+
+    def tearDown(self):
+        subtree_deleted.disconnect(self.on_subtree_deleted)
+        super(DeleteTest, self).tearDown()
+
+    def on_subtree_deleted(self, instance, objects, **kwargs):
+        self.deleted.append(objects)
+
+    def delete_subtree(self, instance, bulk):
+        """
+        Delete subtree of `instance` and check which delete path was used
+        """
+        with mock.patch.object(TreeItem, 'can_bulk_delete',
+                               return_value=bulk), \
+                mock.patch.object(TreeItem, 'bulk_delete', autospec=True,
+                                  side_effect=TreeItem.bulk_delete) as bulk_delete:
+            instance.tree.get().delete()
+        self.assertEqual(bulk_delete.called, bulk)
+
+    def test_collector_used_when_other_models_refer_to_nodes(self):
+        self.assertFalse(TreeItem.can_bulk_delete())
+
+    def test_bulk_delete(self):
+        self.delete_subtree(self.a, bulk=True)
+        self.assertEqual(
+            set(Section.objects.values_list('slug', flat=True)), {'', 'c', 'd'})
+        self.assertEqual(
+            list(Product.objects.values_list('slug', flat=True)), ['p3'])
+        self.assertEqual(self.get_children_slugs(self.root), ['c', 'd'])
+        self.assertEqual(len(self.deleted), 1)
+        self.assertEqual(self.deleted[0], {
+            Section: [self.a.pk, self.b.pk],
+            Product: [product.pk for product in self.products[:3]],
+        })
+        self.assertTreeConsistent()
+
+    def test_collector_delete(self):
+        Note.objects.create(node=self.b.tree.get(), text='b')
+        Note.objects.create(node=self.c.tree.get(), text='c')
+        self.delete_subtree(self.a, bulk=False)
+        self.assertEqual(
+            set(Section.objects.values_list('slug', flat=True)), {'', 'c', 'd'})
+        self.assertEqual(
+            list(Product.objects.values_list('slug', flat=True)), ['p3'])
+        self.assertEqual(list(Note.objects.values_list('text', flat=True)),
+                         ['c'])
+        self.assertEqual(self.get_children_slugs(self.root), ['c', 'd'])
+        self.assertEqual(len(self.deleted), 1)
+        self.assertTreeConsistent()
+
+    def test_delete_leaf(self):
+        self.delete_subtree(self.products[1], bulk=True)
+        self.assertEqual(self.get_children_slugs(self.b), ['p0', 'p2'])
+        self.assertTreeConsistent()
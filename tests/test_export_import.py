@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.test import TestCase
+from catalog.models import TreeItem
+from .base import CatalogTestMixin
+from .models import Section, Product
+
+
+class ExportImportTest(CatalogTestMixin, TestCase):
+
+    def setUp(self):
+        super(ExportImportTest, self).setUp()
+        self.make_tree()
+        handle, self.filename = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+        super(ExportImportTest, self).tearDown()
+
+    def call_command(self, *args, **kwargs):
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            call_command(*args, **kwargs)
+
+    def get_catalog(self):
+        """
+        :return: list of content objects data in tree order
+        """
+        return [(item.level, item.path, item.content_object._meta.label,
+                 item.object_id, str(item.content_object))
+                for item in TreeItem.objects.all()]
+
+    def test_round_trip_with_gaps(self):
+        self.make(Section, 'hidden', self.c, show=False)
+        self.products[2].price = 10
+        self.products[2].save()
+        # numbering with gaps is valid for mptt, it is left after
+        # deletion of nodes by raw queries
+        TreeItem.objects.update(lft=F('lft') * 3, rght=F('rght') * 3 + 1)
+        catalog = self.get_catalog()
+
+        self.call_command('catalog_export', output=self.filename)
+        with open(self.filename) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), len(catalog))
+        self.assertNotIn('descendants', records[0])
+
+        self.root.tree.get().delete()
+        self.assertFalse(TreeItem.objects.exists())
+        self.call_command('catalog_import', self.filename, batch_size=2)
+
+        self.assertEqual(self.get_catalog(), catalog)
+        self.assertEqual(Product.objects.get(slug='p2').price, 10)
+        self.assertFalse(TreeItem.objects.get(slug='hidden').visible)
+        self.assertTreeConsistent()
+
+    def test_existing_objects(self):
+        self.call_command('catalog_export', output=self.filename)
+        with self.assertRaises(CommandError):
+            self.call_command('catalog_import', self.filename)
+
+    def test_wrong_order(self):
+        self.call_command('catalog_export', output=self.filename)
+        with open(self.filename) as f:
+            lines = f.readlines()
+        with open(self.filename, 'w') as f:
+            f.writelines(lines[1:] + lines[:1])
+        self.root.tree.get().delete()
+        with self.assertRaises(CommandError):
+            self.call_command('catalog_import', self.filename)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+from mptt.exceptions import InvalidMove
+from catalog.models import TreeItem
+from catalog.signals import content_objects_bulk_moved, content_object_moved
+from .base import CatalogTestMixin
+from .models import Section, Product
+
+
+class BulkMoveTest(CatalogTestMixin, TestCase):
+
+    def setUp(self):
+        super(BulkMoveTest, self).setUp()
+        self.make_tree()
+        self.moves = []
+        self.single_moves = []
+        content_objects_bulk_moved.connect(self.on_bulk_moved)
+        content_object_moved.connect(self.on_moved)
+
+    def tearDown(self):
+        content_objects_bulk_moved.disconnect(self.on_bulk_moved)
+        content_object_moved.disconnect(self.on_moved)
+        super(BulkMoveTest, self).tearDown()
+
+    def on_bulk_moved(self, moves, **kwargs):
+        self.moves.append(moves)
+
+    def on_moved(self, instance, **kwargs):
+        self.single_moves.append(instance)
+
+    def node(self, instance):
+        return instance.tree.get()
+
+    def test_move_and_reorder(self):
+        p0, p1, p2, p3 = self.products
+        TreeItem.bulk_move([
+            (self.node(p2), self.node(self.b), 'first-child'),
+            (self.node(p0), self.node(self.c), 'last-child'),
+            (self.node(self.d), self.node(self.a), 'left'),
+            (self.node(self.b), self.node(self.d), 'first-child'),
+        ])
+        self.assertEqual(self.get_children_slugs(self.root), ['d', 'a', 'c'])
+        self.assertEqual(self.get_children_slugs(self.d), ['b'])
+        self.assertEqual(self.get_children_slugs(self.b), ['p2', 'p1'])
+        self.assertEqual(self.get_children_slugs(self.c), ['p3', 'p0'])
+        self.assertEqual(Product.objects.get(pk=p1.pk).get_absolute_url(),
+                         '/catalog/d/b/p1/')
+        self.assertTreeConsistent()
+
+    def test_swap_same_slugs(self):
+        section = self.make(Section, 'x', self.a)
+        product = self.make(Product, 'x', self.c)
+        moves = TreeItem.bulk_move([
+            (self.node(section), self.node(self.c), 'last-child'),
+            (self.node(product), self.node(self.a), 'first-child'),
+        ])
+        self.assertEqual(self.get_children_slugs(self.a), ['x', 'b'])
+        self.assertEqual(self.get_children_slugs(self.c), ['p3', 'x'])
+        self.assertEqual(self.node(section).path, 'c/x')
+        self.assertEqual(self.node(product).path, 'a/x')
+        self.assertEqual(self.moves, [moves])
+        self.assertEqual(moves, [(section, self.a, self.c),
+                                 (product, self.c, self.a)])
+        self.assertEqual(self.single_moves, [])
+        self.assertTreeConsistent()
+
+    def test_slug_checked_against_final_state(self):
+        section = self.make(Section, 'x', self.a)
+        product = self.make(Product, 'x', self.c)
+        # section would meet product in c, but product leaves c later
+        TreeItem.bulk_move([
+            (self.node(section), self.node(self.c), 'last-child'),
+            (self.node(product), self.node(self.d), 'last-child'),
+        ])
+        self.assertEqual(self.get_children_slugs(self.c), ['p3', 'x'])
+        self.assertEqual(self.get_children_slugs(self.d), ['x'])
+        self.assertTreeConsistent()
+
+    def test_slug_conflict(self):
+        self.make(Section, 'x', self.a)
+        product = self.make(Product, 'x', self.c)
+        state = self.get_tree_state()
+        with self.assertRaises(InvalidMove):
+            TreeItem.bulk_move([
+                (self.node(self.products[0]), self.node(self.d), 'last-child'),
+                (self.node(product), self.node(self.a), 'last-child'),
+            ])
+        self.assertEqual(state, self.get_tree_state())
+        self.assertEqual(self.moves, [])
+
+    def test_move_into_descendant(self):
+        with self.assertRaises(InvalidMove):
+            TreeItem.bulk_move([
+                (self.node(self.a), self.node(self.b), 'last-child'),
+            ])
+        self.assertTreeConsistent()
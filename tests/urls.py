@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+from django.conf.urls import url, include
+
+urlpatterns = [
+    url(r'^catalog/', include('catalog.urls')),
+]